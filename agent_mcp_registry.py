@@ -1,9 +1,7 @@
 from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
-import os
-from langchain_openai import ChatOpenAI
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+from src.agent.rate_limiter import create_llm, get_rate_limiter, INTERACTIVE
 
 from prompt.prompts import system_prompt
 from src.mcp_client.playwright_mcp import PlaywrightMCPClient
@@ -22,7 +20,7 @@ async def run_agent_task(agent_executor, task: str):
     result = await agent_executor.ainvoke({"input": task})
     return result
 
-async def test_agent(testing_prompt):
+async def test_agent(testing_prompt, priority=INTERACTIVE):
     # Connect to Playwright MCP server
     # print("Connecting to Playwright MCP server...")
     # await mcp_client.connect()
@@ -41,12 +39,8 @@ async def test_agent(testing_prompt):
     editor_tool = [get_writer_tool()]
     azdo_tool = [create_work_items_tool()]
     
-    # Initialize LLM - Use ChatOpenAI with proper configuration
-    llm = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.0,
-        openai_api_key=OPENAI_API_KEY
-    )
+    # Initialize LLM - shares the process-wide rate limiter
+    llm = create_llm(model="gpt-4o", priority=priority)
     
     # Use the OpenAI Functions agent instead of structured chat
     from langchain.agents import create_openai_functions_agent
@@ -79,6 +73,7 @@ async def test_agent(testing_prompt):
             Prompt Tokens: {cb.prompt_tokens}
             Completion Tokens: {cb.completion_tokens}
             Total Cost (USD): ${cb.total_cost}
+            LLM Rate Limiter: {get_rate_limiter().metrics()}
             {"-"*20}
             """
             with open("cost_details.txt", "a", encoding="utf-8") as f:
@@ -1,8 +1,14 @@
 from src.agent.testing_agent import test_agent
+import os
 import asyncio
-from prompt.prompts import testcases_prompt
+import argparse
+from prompt.prompts import testcases_prompt, authenticated_session_note
 import json
-from utils.load_feature_files import load_feature_files
+from utils.load_feature_files import iter_feature_files, iter_scenarios, common_tags
+from src.mcp_client.session_state import SessionStateCache, credential_for_tags, login_recipe
+from src.agent.checkpoint import RunCheckpoint
+from utils.loop_profiler import profiled
+from utils.agent_logs import log_steps
 
 with open("prerequsites/credentials.json", "r", encoding="utf-8") as f:
     credentials = json.load(f)
@@ -28,51 +34,116 @@ testcases_prompt = testcases_prompt.format(
 
 logs = []
 
+def ask(checkpoint, key, question):
+    """Ask a y/n question once per run; a resumed run reuses the original answer"""
+    answers = checkpoint.state.setdefault("answers", {})
+    if key not in answers:
+        answers[key] = input(question).lower() == 'y'
+        checkpoint.save()
+    return answers[key]
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and run the tests for the user story")
+    parser.add_argument("--resume", metavar="RUN_ID", help="continue an interrupted run from its checkpoint")
+    parser.add_argument("--loop-profile", action="store_true",
+                        help="profile event loop lag and blocking calls into profiles/ (same as AGENT_PROFILE=1)")
+    args = parser.parse_args()
+    if args.loop_profile:
+        os.environ["AGENT_PROFILE"] = "1"
+    if args.resume:
+        checkpoint = RunCheckpoint.load(args.resume)
+        print(f"Resuming run {checkpoint.run_id}")
+    else:
+        checkpoint = RunCheckpoint()
+        print(f"Run ID: {checkpoint.run_id} (continue it with: python main.py --resume {checkpoint.run_id})")
+
     # Run the async main function
-    rsp = input("Do you want to run the agent to generate test cases from the user story? (y/n): ")
     logs.append("Running agent to generate test cases from the user story")
-    if rsp.lower() == 'y':
+    if ask(checkpoint, "generate", "Do you want to run the agent to generate test cases from the user story? (y/n): "):
         logs.append("Running Testcase Generation Agent")
-        print("Running Testcase Generation Agent...")   
-        response = asyncio.run(test_agent(testcases_prompt))
-        for action, observation in response["intermediate_steps"]:
-            logs.append(f"Thought: {action.log.split('Action:')[0].strip()}") # Extract thought from the log
-            logs.append(f"Action: {action.tool}")
-            logs.append(f"Action Input: {action.tool_input}")
-            logs.append(f"Observation: {observation}")
-            logs.append("-" * 20)
+        if checkpoint.is_done("generate"):
+            print("Test case generation already completed in this run, skipping")
+            log_steps(logs, checkpoint.steps("generate"))
+        else:
+            print("Running Testcase Generation Agent...")   
+            if ask(checkpoint, "parallel_generate", "Explore the story's flows in parallel, one sub-agent per flow? (y/n): "):
+                from src.agent.generation_agent import generate_tests
+                response = asyncio.run(profiled(
+                    generate_tests(task_id, credentials, parent_folder, checkpoint=checkpoint), "generate"
+                ))
+            else:
+                response = asyncio.run(profiled(
+                    test_agent(testcases_prompt, checkpoint=checkpoint, stage="generate"), "generate"
+                ))
+            log_steps(logs, response["intermediate_steps"])
     logs.append("Finished running agent to generate test cases from the user story")
     logs.append("-"*40)
     logs.append("Running agent on the feature files created")
-    rsp = input("Do you want to run the agent on the feature files created? (y/n): ")
-    if rsp.lower() == 'y':
+    if ask(checkpoint, "execute", "Do you want to run the agent on the feature files created? (y/n): "):
         # folder_path = input("Enter the folder path where the feature files are located (e.g., features/): ").strip()
         folder_path = f"{parent_folder}/features/"
         logs.append(f"Running Testing Agent on feature files in folder: {folder_path}")
         print("Running Testing Agent on feature files...")
-        features = load_feature_files(folder_path)
-        for feature in features:
+        per_scenario = ask(checkpoint, "per_scenario", "Run the feature files scenario by scenario? (y/n): ")
+        if per_scenario:
+            # One agent call per scenario keeps each prompt small and lets failures be retried individually
+            features = ((unit.id, unit.render(), unit.tags) for unit in iter_scenarios(folder_path))
+        else:
+            # A whole file only starts logged in if all of its scenarios need it
+            features = ((path, content, common_tags(path)) for path, content in iter_feature_files(folder_path))
+        session_cache = SessionStateCache()
+        for feature_id, feature, tags in features:
+            logs.append(f"Feature: {feature_id}")
+            stage = f"execute:{feature_id}"
+            if checkpoint.is_done(stage):
+                print(f"{feature_id} already completed in this run, skipping")
+                log_steps(logs, checkpoint.steps(stage))
+                continue
             from prompt.prompts import testing_prompt
             testing_prompt = testing_prompt.format(
                 feature=feature
             )
-            response = asyncio.run(test_agent(testing_prompt))
-            for action, observation in response["intermediate_steps"]:
-                logs.append(f"Thought: {action.log.split('Action:')[0].strip()}") # Extract thought from the log
-                logs.append(f"Action: {action.tool}")
-                logs.append(f"Action Input: {action.tool_input}")
-                logs.append(f"Observation: {observation}")
-                logs.append("-" * 20)
+            # Scenarios tagged @authenticated / @auth:<name> start from a cached logged-in session
+            storage_state = None
+            credential_name = credential_for_tags(tags)
+            recipe = login_recipe(credentials, credential_name, feature) if credential_name else None
+            if credential_name and recipe is None:
+                # The credential set logs in to another site (or has no login recipe): cold start
+                logs.append(f"No authenticated session for {credential_name} on this feature's site")
+            elif credential_name:
+                try:
+                    # A resumed stage continues from the session it was started with
+                    storage_state = checkpoint.storage_state(stage)
+                    if not storage_state or not os.path.exists(storage_state):
+                        storage_state = asyncio.run(session_cache.ensure(credential_name, credentials, recipe))
+                    testing_prompt += authenticated_session_note.format(credential_name=credential_name)
+                    logs.append(f"Restored authenticated session for: {credential_name}")
+                except Exception as e:
+                    logs.append(f"Could not restore authenticated session for {credential_name}: {e}")
+            response = asyncio.run(profiled(test_agent(
+                testing_prompt, storage_state=storage_state, tool_phase="execute",
+                checkpoint=checkpoint, stage=stage
+            ), "execute"))
+            log_steps(logs, response["intermediate_steps"])
     logs.append("Finished running agent on the feature files created")
     # Save logs to a file
     with open("agent_thoughts.log", "w", encoding="utf-8") as f:
         f.write("\n".join(logs))
     
     # Run Critic Agent
-    rsp = input("Do you want to run the Critic agent to evaluate the test cases created? (y/n): ")
-    if rsp.lower() == 'y':
+    if checkpoint.is_done("evaluate"):
+        print("Evaluation already completed in this run")
+    elif ask(checkpoint, "evaluate", "Do you want to run the Critic agent to evaluate the test cases created? (y/n): "):
         logs.append("Running Critic Agent to evaluate the test cases created")
         print("Running Critic Agent to evaluate the test cases created...")
-        from src.agent.critic_agent import main as run_critic_agent
-        asyncio.run(run_critic_agent())
\ No newline at end of file
+        from src.agent.critic_agent import run_evaluation_agent
+        from prompt.prompts import evaluation_task
+        result = asyncio.run(profiled(
+            run_evaluation_agent(evaluation_task.format(log_path="agent_thoughts.log")), "evaluate"
+        ))
+        # A failed evaluation stays pending so --resume runs it again
+        if result is not None:
+            checkpoint.complete("evaluate", result.get("output"))
+            print("📄 Check 'evaluation.html' for the detailed report")
+        else:
+            print("❌ Evaluation failed, run again with --resume to retry it")
@@ -10,7 +10,9 @@ CRITICAL:
 
          **AFTER EVERY ACTION, ANALYZE THE PAGE AND DECIDE THE NEXT STEP BASED ON THE CURRENT PAGE CONTENT AND STRUCTURE.**
 
+         Before inspecting a page, call `lookup_known_selectors` with its URL and reuse the selectors that worked in previous runs; only explore the page for elements that are missing or reported as NOT on the current page.
          Use the `write_create_file` tool to create and write files when needed in the local filesystem.
+         Only the tools needed for the current step are available. If you need a tool that is not available (for example `write_create_file` when you are ready to write files), call `request_tools` with the category first.
 Help users automate web interactions and testing tasks thoroughly."""
 
 testing_prompt = """
@@ -28,6 +30,21 @@ Here is the content of the .feature file:
 3. After all scenarios have been executed, Create a html file with the feature names in my local filesystem of the results, including the total number of scenarios using 'write_create_file' tool in a HTML Table format, how many passed, how many failed and with explanations.
 """
 
+authenticated_session_note = """
+NOTE: The browser already has an authenticated session for the '{credential_name}' user restored from a previous login.
+Skip steps that only log in with these credentials (navigating to the login page, typing username/password, clicking "Log In") and start from the logged in page.
+"""
+
+resumed_run_note = """
+NOTE: This run was interrupted and is being resumed. Your previous actions and their results are kept, but the browser was restarted: {browser_state}. Whatever your previous actions changed in the browser session (logins, cookies, form input) is lost, so redo those steps if you still need them. Do not redo work that is already done (for example files that were already written).
+"""
+
+resumed_on_url = "it was reopened on {url}, the page of your last action"
+resumed_on_blank_page = "it is on a blank page, navigate back to the page you need before continuing"
+
+# Shared by the prompts that generate feature files, the runner restores the session of tagged scenarios
+authenticated_tagging_rule = "Tag every scenario that needs a logged in user but does not test the login itself with `@authenticated` (or `@auth:<credential name>` to log in with another entry of the credentials, e.g. `@auth:valid_user`), put the tag on the Feature line if it applies to all of its scenarios, and start those scenarios by opening the URL of the logged in page instead of repeating the login steps; the runner restores a logged in browser session for them when that URL is on the site of the credentials' `login.url`."
+
 testcases_prompt = """
 You are a generic automated test generator agent.
 
@@ -48,18 +65,102 @@ Mandatory flow for your behavior:
 2) Decide autonomously which files are needed (one or more feature files, step definition files). You may create as many files as you deem necessary. But make sure the files you create are 100 percent accurate and complete, so a human can run them without any further work.
 3) Always provide the url in the feature file as the first step if any provided in the story.
 4) When writing files create any directories implied by the file paths (the "write_create_file" tool will create files - ensure your paths include directories as desired).
-5) Use the MCP browser tools to inspect pages and produce robust selectors. Prefer id, name data, or ARIA attributes; otherwise craft resilient CSS or XPath selectors and document the reason in a comment in the generated file.
+5) Call `lookup_known_selectors` for each page first, then use the MCP browser tools to inspect pages only for what is missing and produce robust selectors. Prefer id, name data, or ARIA attributes; otherwise craft resilient CSS or XPath selectors and document the reason in a comment in the generated file.
 6) If an element cannot be located or behavior can't be fully determined, include a comment 'TODO' and still create the artifact so a human can complete it later. Add a header comment to every generated file saying: "AUTO-GENERATED review and verify selector's
 7) At the end, return a concise list of created files in the format `CREATED: <path> <purpose>`.
 
 Style and constraints:
 - Feature files should directly reflect flows from the high-level story.
+- """ + authenticated_tagging_rule + """
 - Step definitions should use Playwright idioms (`page.locator`, `await page.waitFor`, `expect`). Use explicit waits and avoid brittle sleeps.
 
 Begin by parsing the story and proposing the file set (emit the proposal JSON). Then inspect the site(s) and create the files listed in the proposal using `write_create_file` tool. Include short comments documenting selectors.
 """
 
 
+site_exploration_prompt = """
+You are exploring a website once so that several test generation runs for the same site can reuse what you learn.
+
+Target site URLs:
+{urls}
+
+Here are the credentials you can use if needed:
+{credentials}
+
+Using the MCP browser tools:
+1) Visit each URL and the pages reachable from it that the stories below are about.
+2) Record stable selectors (prefer id, name, data- or ARIA attributes) for every form field, button and link you interact with, grouped by page URL.
+3) Record how to log in (URL, selectors, what the page shows after a successful and a failed login).
+
+Stories that will be tested on this site:
+{story_titles}
+
+Do NOT create any files. Return your findings as concise markdown with one section per page.
+"""
+
+batch_testcases_prompt = """
+You are a generic automated test generator agent.
+
+Your job: Given a short, high-level user story/epic/feature/task and one or more target websites, generate the test artifacts needed to implement the flows
+
+High-level story/Epic/Feature/Task (ID {task_id}, already retrieved from Azure DevOps, do not fetch it again):
+Title: {title}
+{description}
+
+Here are the credentials you can use if needed:
+{credentials}
+
+The site was already explored for this batch. Reuse these findings instead of re-inspecting pages, and only use the browser tools to verify anything missing:
+{site_notes}
+
+Parent folder requirement: 
+1. parent folder name: {parent_folder}
+2. You MUST place All generated files and subfolders inside {parent_folder}. The agent/tool will create the directories under {parent_folder} - do NOT write files outside this parent folder.
+
+Follow the same rules as usual: always provide the url in the feature file as the first step, step definitions use Playwright idioms (`page.locator`, `await page.waitFor`, `expect`), add the header comment "AUTO-GENERATED review and verify selector's" to every generated file, document selectors in short comments and mark anything undetermined with 'TODO'.
+""" + authenticated_tagging_rule + """
+Create the files using `write_create_file` tool and at the end, return a concise list of created files in the format `CREATED: <path> <purpose>`.
+"""
+
+generation_plan_prompt = """
+You are planning the test generation for a user story. Several agents will explore the site in parallel, each in its own browser, so split the story into independent flows.
+
+High-level story/Epic/Feature/Task (ID {task_id}):
+Title: {title}
+{description}
+
+Rules:
+1) One flow per distinct user journey (for example login, registration, transfer funds). Each flow must be testable on its own starting from its URL; if it needs a logged in user, say so in its description.
+2) Take the URLs from the story. Do not invent URLs that are not in the story or reachable from them.
+3) List the files each flow needs (feature files, step definition files), relative to the parent folder (for example `features/login.feature`, `step_definitions/login_steps.js`). Two flows never share a file.
+
+Return ONLY the proposal JSON, without any explanation:
+{{"flows": [{{"name": "<short_snake_case_name>", "url": "<start URL>", "description": "<what to cover, including negative cases>", "files": ["<path>", "..."]}}]}}
+"""
+
+flow_generation_prompt = """
+You are one of several test generator agents working in parallel on the same user story. You only cover ONE flow of it; the other flows are covered by other agents in their own browsers.
+
+High-level story/Epic/Feature/Task (ID {task_id}, already retrieved from Azure DevOps, do not fetch it again):
+Title: {title}
+{description}
+
+Your flow: {flow_name}
+Start URL: {url}
+{flow_description}
+
+Here are the credentials you can use if needed:
+{credentials}
+
+1) Navigate to the start URL. Call `lookup_known_selectors` for each page first, then use the MCP browser tools to inspect pages only for what is missing and verify every selector you use. Prefer id, name data, or ARIA attributes; otherwise craft resilient CSS or XPath selectors and document the reason in a comment in the generated file.
+2) Create exactly these files with `write_create_file`, with paths relative to the parent folder as listed, and no other files:
+{files}
+
+Follow the same rules as usual: always provide the url in the feature file as the first step, step definitions use Playwright idioms (`page.locator`, `await page.waitFor`, `expect`), add the header comment "AUTO-GENERATED review and verify selector's" to every generated file, document selectors in short comments and mark anything undetermined with 'TODO'.
+""" + authenticated_tagging_rule + """
+At the end, return a concise list of created files in the format `CREATED: <path> <purpose>`.
+"""
+
 EVALUATION_SYSTEM_PROMPT = """You are an expert QA evaluator and critic for test automation processes. 
 Your role is to thoroughly analyze test automation execution logs, compare them against requirements, 
 and provide detailed evaluation reports.
@@ -85,7 +186,7 @@ evaluation_task = """
     You are tasked with evaluating the test automation process that was executed. Follow these steps:
 
     1. **Read the Agent Execution Log**:
-       - Use read_file to read 'agent_thoughts.log'
+       - Use read_file to read '{log_path}'
        - Understand the sequence of actions performed by the testing agent
        - Identify what was tested and how
 
@@ -0,0 +1,179 @@
+# Batch test generation over many Azure DevOps work items.
+#
+# Work items are fetched in batched ADO calls and grouped by the site their story
+# targets. Each site is explored once (pages, selectors, login flow) and the findings
+# are shared by every story of that site, using one warm browser session per site.
+# Notes are kept in <parent_folder>/site_notes.md and reused for SITE_NOTES_MAX_AGE_HOURS
+# (default 24), or explored again with --refresh-notes.
+#
+# Usage:
+#   python -m src.agent.batch_runner --ids 3 4 7
+#   python -m src.agent.batch_runner --wiql "SELECT [System.Id] FROM WorkItems WHERE [System.IterationPath] = @CurrentIteration"
+import os
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+from prompt.prompts import site_exploration_prompt, batch_testcases_prompt
+from src.mcp_client.playwright_mcp import PlaywrightMCPClient
+from src.agent.testing_agent import create_test_agent_executor, run_with_cost_tracking
+from src.agent.rate_limiter import BATCH
+from src.tools.get_user_story_tool import (
+    AzureDevOpsConnector, organization_url, personal_access_token, project_name
+)
+from utils.get_parent_folder import get_parent_folder, get_site_key, get_site_urls
+from utils.loop_profiler import profiled
+from utils.agent_logs import log_steps
+
+# Site notes older than this are explored again, selectors go stale as sites change
+SITE_NOTES_MAX_AGE = float(os.getenv("SITE_NOTES_MAX_AGE_HOURS", "24")) * 3600
+
+
+def group_by_site(work_items: List[Dict[str, Any]]) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    """Group work items by the host of the first URL in their description (None if there is no URL)"""
+    groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for item in work_items:
+        groups.setdefault(get_site_key(item["description"] or ""), []).append(item)
+    return groups
+
+
+async def explore_site(agent_executor, site_items, credentials, notes_path: str, logs: List[str],
+                       refresh: bool = False) -> str:
+    """Explore the site once for all its stories, reusing recent notes from a previous batch if present"""
+    if not refresh and os.path.exists(notes_path) and time.time() - os.path.getmtime(notes_path) < SITE_NOTES_MAX_AGE:
+        with open(notes_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    urls = []
+    for item in site_items:
+        urls.extend(get_site_urls(item["description"] or ""))
+    prompt = site_exploration_prompt.format(
+        urls="\n".join(f"- {url}" for url in dict.fromkeys(urls)),
+        credentials=credentials,
+        story_titles="\n".join(f"- {item['id']}: {item['title']}" for item in site_items),
+    )
+    result = await run_with_cost_tracking(agent_executor, prompt, tool_phase="execute")
+    log_steps(logs, result.get("intermediate_steps", []))
+    notes = result.get("output", "")
+    os.makedirs(os.path.dirname(notes_path) or ".", exist_ok=True)
+    with open(notes_path, "w", encoding="utf-8") as f:
+        f.write(notes)
+    return notes
+
+
+async def run_site_group(site, site_items, credentials, logs: List[str], profile: Optional[str] = None,
+                         refresh_notes: bool = False) -> Dict[Any, str]:
+    """Generate tests for all stories of one site on a single warm browser session"""
+    parent_folder = get_parent_folder(site_items[0]["description"] or "") if site else "autogen/project"
+    # Isolated so concurrent site groups don't share one persistent browser profile
+    mcp_client = PlaywrightMCPClient(profile=profile, isolated=True)
+    await mcp_client.connect()
+    outputs = {}
+    try:
+        mcp_tools = await mcp_client.list_tools()
+        agent_executor = create_test_agent_executor(mcp_client, mcp_tools, priority=BATCH)
+
+        site_notes = "No site notes available, inspect the pages yourself."
+        if site:
+            logs.append(f"Exploring site {site} for {len(site_items)} work items")
+            try:
+                site_notes = await explore_site(
+                    agent_executor, site_items, credentials, f"{parent_folder}/site_notes.md", logs, refresh_notes
+                )
+            except Exception as e:
+                logs.append(f"Exploring site {site} failed, each work item explores on its own: {e}")
+
+        for item in site_items:
+            logs.append(f"Generating tests for work item {item['id']}: {item['title']}")
+            prompt = batch_testcases_prompt.format(
+                task_id=item["id"],
+                title=item["title"],
+                description=item["description"],
+                credentials=credentials,
+                site_notes=site_notes,
+                parent_folder=f"{parent_folder}/task_{item['id']}",
+            )
+            mcp_client.page_state.begin_conversation()
+            try:
+                # The story is already in the prompt, skip the Azure DevOps lookup phase
+                result = await run_with_cost_tracking(agent_executor, prompt, tool_phase="execute")
+                log_steps(logs, result.get("intermediate_steps", []))
+                outputs[item["id"]] = result.get("output", "")
+            except Exception as e:
+                logs.append(f"Work item {item['id']} failed: {e}")
+                outputs[item["id"]] = f"FAILED: {e}"
+    finally:
+        logs.append(f"Page state cache for {site}: {mcp_client.page_state.stats()}")
+        await mcp_client.disconnect()
+    return outputs
+
+
+async def run_batch(work_item_ids: Optional[List[int]] = None, wiql: Optional[str] = None,
+                    credentials: Optional[Dict[str, Any]] = None, concurrency: int = 1,
+                    profile: Optional[str] = None, refresh_notes: bool = False) -> Dict[Any, str]:
+    """
+    Generate tests for many work items in one pass
+
+    Args:
+        work_item_ids: IDs of the work items to process
+        wiql: WIQL query selecting the work items (used if no IDs are given)
+        credentials: credentials passed to the agents
+        concurrency: number of sites processed at the same time
+        profile: browser launch profile (see src/mcp_client/launch_profiles.py)
+        refresh_notes: explore every site again even if its notes are recent
+
+    Returns:
+        Dict of work item ID -> agent output
+    """
+    connector = AzureDevOpsConnector(organization_url, personal_access_token, project_name)
+    if not work_item_ids:
+        work_item_ids = await asyncio.to_thread(connector.query_work_item_ids, wiql)
+    print(f"Fetching {len(work_item_ids)} work items...")
+    work_items = await asyncio.to_thread(connector.get_work_items_by_ids, work_item_ids)
+
+    groups = group_by_site(work_items)
+    for site, site_items in groups.items():
+        print(f"  - {site or '<no url>'}: {', '.join(str(item['id']) for item in site_items)}")
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run_group(site, site_items):
+        # Each group logs into its own list so concurrent sites don't interleave their steps
+        group_logs: List[str] = []
+        async with semaphore:
+            group_outputs = await run_site_group(
+                site, site_items, credentials or {}, group_logs, profile, refresh_notes
+            )
+        return group_outputs, group_logs
+
+    outputs, logs = {}, []
+    for group_outputs, group_logs in await asyncio.gather(*(run_group(s, i) for s, i in groups.items())):
+        outputs.update(group_outputs)
+        logs.extend(group_logs)
+
+    with open("batch_agent_thoughts.log", "w", encoding="utf-8") as f:
+        f.write("\n".join(logs))
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate tests for many Azure DevOps work items")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--ids", nargs="+", type=int, help="work item IDs")
+    group.add_argument("--wiql", help="WIQL query selecting the work items")
+    parser.add_argument("--concurrency", type=int, default=1, help="sites processed in parallel")
+    parser.add_argument("--profile", help="browser launch profile, e.g. 'fast' (see src/mcp_client/launch_profiles.py)")
+    parser.add_argument("--refresh-notes", action="store_true",
+                        help="explore the sites again instead of reusing their site_notes.md")
+    args = parser.parse_args()
+
+    with open("prerequsites/credentials.json", "r", encoding="utf-8") as f:
+        credentials = json.load(f)
+
+    outputs = asyncio.run(profiled(
+        run_batch(args.ids, args.wiql, credentials, args.concurrency, args.profile, args.refresh_notes), "batch"
+    ))
+    for work_item_id, output in outputs.items():
+        print(f"\n=== Work item {work_item_id} ===\n{output}")
@@ -0,0 +1,101 @@
+# Per-step checkpoints of agent runs, so an interrupted run can be resumed.
+#
+# A run is split in stages ("generate", "execute:<feature>", "evaluate"). For every stage
+# we persist each agent step (action + observation) as soon as it completes, the files the
+# agent wrote, the browser storage state it started from and the page URL after each step.
+# On resume, finished stages are skipped and an unfinished stage is continued: its recorded
+# steps are replayed into the agent's scratchpad instead of being executed (and paid for)
+# again and the browser is sent back to the last recorded URL.
+import os
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.load import dumpd, load
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", ".checkpoints")
+
+
+class RunCheckpoint:
+    """Checkpoint file of one run, stored as <directory>/<run_id>.json"""
+
+    def __init__(self, run_id: Optional[str] = None, directory: str = CHECKPOINT_DIR):
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.directory = directory
+        self.path = os.path.join(directory, f"{self.run_id}.json")
+        self.state: Dict[str, Any] = {
+            "run_id": self.run_id,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "stages": {},
+            "generated_files": [],
+        }
+
+    @classmethod
+    def load(cls, run_id: str, directory: str = CHECKPOINT_DIR) -> "RunCheckpoint":
+        checkpoint = cls(run_id, directory)
+        if not os.path.exists(checkpoint.path):
+            raise FileNotFoundError(f"No checkpoint found for run '{run_id}' in {directory}")
+        with open(checkpoint.path, "r", encoding="utf-8") as f:
+            checkpoint.state = json.load(f)
+        return checkpoint
+
+    def save(self):
+        """Write the checkpoint atomically so a crash never leaves a truncated file"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.state["updated_at"] = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _stage(self, stage: str) -> Dict[str, Any]:
+        return self.state["stages"].setdefault(stage, {"status": "pending", "steps": [], "output": None})
+
+    def is_done(self, stage: str) -> bool:
+        return self.state["stages"].get(stage, {}).get("status") == "done"
+
+    def start(self, stage: str, storage_state: Optional[str] = None):
+        data = self._stage(stage)
+        data["status"] = "running"
+        if storage_state:
+            data["storage_state"] = storage_state
+        self.save()
+
+    def output(self, stage: str) -> Optional[str]:
+        return self.state["stages"].get(stage, {}).get("output")
+
+    def storage_state(self, stage: str) -> Optional[str]:
+        return self.state["stages"].get(stage, {}).get("storage_state")
+
+    def url(self, stage: str) -> Optional[str]:
+        """Page URL the browser was on after the last recorded step"""
+        return self.state["stages"].get(stage, {}).get("url")
+
+    def steps(self, stage: str) -> List[Tuple[Any, Any]]:
+        """Recorded (action, observation) steps of the stage, rebuilt as LangChain objects"""
+        return [
+            (load(step["action"]), step["observation"])
+            for step in self.state["stages"].get(stage, {}).get("steps", [])
+        ]
+
+    def record_step(self, stage: str, action, observation, url: Optional[str] = None):
+        data = self._stage(stage)
+        if url:
+            data["url"] = url
+        data["steps"].append({
+            "action": dumpd(action),
+            "observation": observation if isinstance(observation, str) else str(observation),
+        })
+        if action.tool == "write_create_file" and isinstance(action.tool_input, dict):
+            path = action.tool_input.get("path")
+            if path and path not in self.state["generated_files"]:
+                self.state["generated_files"].append(path)
+        self.save()
+
+    def complete(self, stage: str, output: Optional[str] = None):
+        data = self._stage(stage)
+        data["status"] = "done"
+        data["output"] = output
+        self.save()
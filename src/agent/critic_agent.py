@@ -1,9 +1,7 @@
 from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
-import os
-from langchain_openai import ChatOpenAI
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+from src.agent.rate_limiter import create_llm, get_rate_limiter, INTERACTIVE
 
 from langchain.agents import AgentExecutor
 from src.tools.editor_tools import get_writer_tool, get_reader_tool
@@ -11,14 +9,8 @@ from src.tools.get_user_story_tool import create_work_items_tool
 from langchain_community.callbacks import get_openai_callback
 from prompt.prompts import EVALUATION_SYSTEM_PROMPT, evaluation_task
 
-async def run_evaluation_agent(evaluation_prompt):
-    """
-    Run the evaluation agent to analyze the test execution process
-    
-    Args:
-        evaluation_prompt: The task description for evaluation
-    """
-    
+def create_evaluation_agent_executor(priority=INTERACTIVE):
+    """Build the tools, LLM and AgentExecutor used by the evaluation agent"""
     # Initialize tools
     reader_tool = get_reader_tool()
     writer_tool = get_writer_tool()
@@ -26,12 +18,8 @@ async def run_evaluation_agent(evaluation_prompt):
     
     tools = [reader_tool, writer_tool, azdo_tool]
     
-    # Initialize LLM
-    llm = ChatOpenAI(
-        model="gpt-4o",  # Using more capable model for evaluation
-        temperature=0.0,
-        openai_api_key=OPENAI_API_KEY
-    )
+    # Initialize LLM (shares the process-wide rate limiter)
+    llm = create_llm(model="gpt-4o", priority=priority)  # Using more capable model for evaluation
     
     # Create agent with OpenAI Functions
     from langchain.agents import create_openai_functions_agent
@@ -52,6 +40,19 @@ async def run_evaluation_agent(evaluation_prompt):
         max_iterations=20,
         return_intermediate_steps=True
     )
+    return agent_executor
+
+
+async def run_evaluation_agent(evaluation_prompt, agent_executor=None):
+    """
+    Run the evaluation agent to analyze the test execution process
+    
+    Args:
+        evaluation_prompt: The task description for evaluation
+        agent_executor: A pre-built executor to reuse (built on demand if None)
+    """
+    if agent_executor is None:
+        agent_executor = create_evaluation_agent_executor()
 
     try:
         cost_details = ""
@@ -69,6 +70,7 @@ async def run_evaluation_agent(evaluation_prompt):
             Prompt Tokens: {cb.prompt_tokens}
             Completion Tokens: {cb.completion_tokens}
             Total Cost (USD): ${cb.total_cost}
+            LLM Rate Limiter: {get_rate_limiter().metrics()}
             {"-"*20}
             """
             
@@ -91,9 +93,9 @@ async def run_evaluation_agent(evaluation_prompt):
         return None
 
 
-async def main():
+async def main(log_path="agent_thoughts.log"):
     """Main function to run the evaluation agent"""    
-    result = await run_evaluation_agent(evaluation_task)
+    result = await run_evaluation_agent(evaluation_task.format(log_path=log_path))
     
     if result:
         print("\n✅ Evaluation completed successfully!")
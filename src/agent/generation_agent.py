@@ -0,0 +1,265 @@
+# Parallel test generation: plan, explore the flows concurrently, merge.
+#
+# 1) plan    - one LLM call splits the story into independent flows (the proposal JSON),
+#              each with its start URL and the files it needs.
+# 2) explore - one sub-agent per flow, each with its own isolated browser, running
+#              concurrently (bounded by the CPU count and GENERATION_MAX_SESSIONS). Sub-agents
+#              only draft their files: `write_create_file` is replaced by a draft writer and
+#              the drafts are read back from the agent steps (so checkpointed flows keep them).
+# 3) merge   - deterministic, in plan order: drafts are written under parent_folder (paths
+#              escaping it are skipped, conflicting drafts of the same path are suffixed with
+#              the flow name), together with the proposal and the selectors each flow used.
+#
+# Usage:
+#   python -m src.agent.generation_agent --task-id 3 --parent-folder parabank_tests --profile fast
+import os
+import re
+import json
+import asyncio
+import argparse
+import posixpath
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from prompt.prompts import generation_plan_prompt, flow_generation_prompt
+from src.mcp_client.playwright_mcp import PlaywrightMCPClient
+from src.agent.testing_agent import create_test_agent_executor, run_with_cost_tracking
+from src.agent.rate_limiter import create_llm
+from src.tools.editor_tools import get_draft_writer_tool, write_file
+from src.tools.selector_index import get_selector_index, format_selectors
+from src.tools.get_user_story_tool import (
+    AzureDevOpsConnector, organization_url, personal_access_token, project_name
+)
+from utils.get_parent_folder import get_site_urls
+from utils.loop_profiler import profiled
+
+# Browsers running at the same time, on top of the CPU count limit
+GENERATION_MAX_SESSIONS = int(os.getenv("GENERATION_MAX_SESSIONS", "4"))
+
+
+@dataclass
+class FlowResult:
+    flow: Dict[str, Any]
+    drafts: Dict[str, str] = field(default_factory=dict)
+    selectors: List[Dict[str, Any]] = field(default_factory=list)
+    intermediate_steps: List[Tuple[Any, Any]] = field(default_factory=list)
+    output: str = ""
+    error: Optional[str] = None
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower() or "flow"
+
+
+def parse_plan(text: str, story: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flows of the planner's proposal JSON; one flow per story URL if it can't be parsed"""
+    urls = get_site_urls(story["description"] or "")
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    flows = []
+    try:
+        flows = json.loads(match.group(0)).get("flows", []) if match else []
+    except (ValueError, AttributeError):
+        flows = []
+    if not flows:
+        flows = [
+            {"name": f"flow_{i + 1}", "url": url, "description": "Cover the story on this page.", "files": []}
+            for i, url in enumerate(urls)
+        ]
+    names = set()
+    for flow in flows:
+        # Flow names key the checkpoint stages and file suffixes, keep them unique
+        name = _slug(str(flow.get("name", "")))
+        while name in names:
+            name += "_"
+        names.add(name)
+        flow["name"] = name
+        flow["url"] = str(flow.get("url") or (urls[0] if urls else ""))
+        flow.setdefault("description", "")
+        flow["files"] = [str(path) for path in flow.get("files") or []] or [
+            f"features/{name}.feature", f"step_definitions/{name}_steps.js"
+        ]
+    return flows
+
+
+async def plan_flows(story: Dict[str, Any], checkpoint=None) -> List[Dict[str, Any]]:
+    """Ask the planner for the proposal JSON (once per run when checkpointed)"""
+    if checkpoint is not None and checkpoint.is_done("plan"):
+        return json.loads(checkpoint.output("plan"))
+    llm = create_llm(model="gpt-4o-mini")
+    prompt = generation_plan_prompt.format(
+        task_id=story["id"], title=story["title"], description=story["description"]
+    )
+    response = await llm.ainvoke(prompt)
+    flows = parse_plan(response.content, story)
+    if checkpoint is not None:
+        checkpoint.start("plan")
+        checkpoint.complete("plan", json.dumps(flows))
+    return flows
+
+
+def drafts_from_steps(steps) -> Dict[str, str]:
+    """Files the agent drafted with write_create_file, the last draft of a path wins"""
+    drafts = {}
+    for action, _ in steps:
+        if action.tool == "write_create_file" and isinstance(action.tool_input, dict):
+            path, content = action.tool_input.get("path"), action.tool_input.get("content")
+            if path and content is not None:
+                drafts[path] = content
+    return drafts
+
+
+async def explore_flow(flow, story, credentials, semaphore: asyncio.Semaphore, profile=None,
+                       checkpoint=None) -> FlowResult:
+    """Explore one flow in its own browser and draft its files"""
+    stage = f"generate:{flow['name']}"
+    if checkpoint is not None and checkpoint.is_done(stage):
+        steps = checkpoint.steps(stage)
+        return FlowResult(flow, drafts_from_steps(steps), get_selector_index().lookup(flow["url"]),
+                          steps, checkpoint.output(stage) or "")
+
+    prompt = flow_generation_prompt.format(
+        task_id=story["id"],
+        title=story["title"],
+        description=story["description"],
+        flow_name=flow["name"],
+        url=flow["url"],
+        flow_description=flow["description"],
+        credentials=credentials,
+        files="\n".join(f"- {path}" for path in flow["files"]),
+    )
+    async with semaphore:
+        print(f"Exploring flow '{flow['name']}' ({flow['url']})...")
+        client = PlaywrightMCPClient(profile=profile, isolated=True)
+        try:
+            await client.connect()
+            mcp_tools = await client.list_tools()
+            agent_executor = create_test_agent_executor(client, mcp_tools, writer_tool=get_draft_writer_tool())
+            client.page_state.begin_conversation()
+            if checkpoint is not None:
+                checkpoint.start(stage)
+            result = await run_with_cost_tracking(
+                agent_executor, prompt, tool_phase="execute", checkpoint=checkpoint, stage=stage,
+                mcp_client=client
+            )
+            steps = result.get("intermediate_steps", [])
+            return FlowResult(flow, drafts_from_steps(steps), get_selector_index().lookup(flow["url"]),
+                              steps, result.get("output", ""))
+        except Exception as e:
+            print(f"Flow '{flow['name']}' failed: {e}")
+            return FlowResult(flow, error=str(e))
+        finally:
+            await client.disconnect()
+
+
+def safe_relative_path(path: str, parent_folder: str) -> Optional[str]:
+    """Path of a draft relative to parent_folder, or None if it would be written outside of it"""
+    path = path.replace("\\", "/").strip()
+    parent = parent_folder.replace("\\", "/").rstrip("/")
+    if path.startswith(parent + "/"):
+        path = path[len(parent) + 1:]
+    if path.startswith("/") or re.match(r"^[A-Za-z]:", path):
+        return None
+    path = posixpath.normpath(path)
+    if path in (".", "..") or path.startswith("../"):
+        return None
+    return path
+
+
+def merge_drafts(results: List[FlowResult], parent_folder: str) -> List[str]:
+    """Write the drafts of all flows under parent_folder; returns the summary lines"""
+    written: Dict[str, str] = {}
+    summary = []
+    for result in results:
+        name = result.flow["name"]
+        if result.error:
+            summary.append(f"FAILED: flow {name}: {result.error}")
+            continue
+        for path, content in result.drafts.items():
+            relative = safe_relative_path(path, parent_folder)
+            if relative is None:
+                summary.append(f"SKIPPED: {path} (outside of {parent_folder}, flow {name})")
+                continue
+            if relative in written:
+                if written[relative] == content:
+                    continue
+                stem, ext = posixpath.splitext(relative)
+                relative = f"{stem}.{name}{ext}"
+            written[relative] = content
+            write_file(os.path.join(parent_folder, relative), content)
+            summary.append(f"CREATED: {parent_folder}/{relative} (flow {name})")
+    return summary
+
+
+def write_plan_artifacts(results: List[FlowResult], parent_folder: str) -> List[str]:
+    """Write the proposal JSON and the selectors used by each flow next to the tests"""
+    write_file(os.path.join(parent_folder, "proposal.json"),
+               json.dumps({"flows": [result.flow for result in results]}, indent=2))
+    sections = ["# AUTO-GENERATED review and verify selector's\n"]
+    for result in results:
+        sections.append(f"## {result.flow['name']} ({result.flow['url']})\n")
+        sections.append((format_selectors(result.selectors) or "No selectors recorded.") + "\n")
+    write_file(os.path.join(parent_folder, "selectors.md"), "\n".join(sections))
+    return [f"CREATED: {parent_folder}/proposal.json (plan)", f"CREATED: {parent_folder}/selectors.md (selectors)"]
+
+
+async def generate_tests(task_id, credentials, parent_folder: str, concurrency: Optional[int] = None,
+                         profile=None, checkpoint=None) -> Dict[str, Any]:
+    """
+    Generate the tests of a work item with one exploration sub-agent per flow
+
+    Args:
+        task_id: Azure DevOps work item ID
+        credentials: credentials passed to the agents
+        parent_folder: folder the generated files are written to
+        concurrency: flows explored at the same time (default: CPU count, at most GENERATION_MAX_SESSIONS)
+        profile: browser launch profile (see src/mcp_client/launch_profiles.py)
+        checkpoint: RunCheckpoint, finished flows are not explored again on resume
+
+    Returns:
+        Dict with the merge summary as "output" and the steps of all flows as "intermediate_steps"
+    """
+    connector = AzureDevOpsConnector(organization_url, personal_access_token, project_name)
+    work_items = await asyncio.to_thread(connector.get_work_items_by_ids, [int(task_id)])
+    if not work_items:
+        raise ValueError(f"Work item {task_id} not found")
+    story = work_items[0]
+
+    flows = await plan_flows(story, checkpoint)
+    if not flows:
+        raise ValueError(f"No flows or URLs found in work item {task_id}")
+    if concurrency is None:
+        concurrency = min(os.cpu_count() or 1, GENERATION_MAX_SESSIONS)
+    concurrency = max(1, min(concurrency, len(flows)))
+    print(f"Exploring {len(flows)} flows, {concurrency} at a time:")
+    for flow in flows:
+        print(f"  - {flow['name']}: {flow['url']}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(
+        *(explore_flow(flow, story, credentials, semaphore, profile, checkpoint) for flow in flows)
+    )
+
+    summary = merge_drafts(results, parent_folder) + write_plan_artifacts(results, parent_folder)
+    output = "\n".join(summary)
+    print(output)
+    intermediate_steps = [step for result in results for step in result.intermediate_steps]
+    if checkpoint is not None:
+        checkpoint.start("generate")
+        checkpoint.complete("generate", output)
+    return {"output": output, "intermediate_steps": intermediate_steps}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the tests of a work item with parallel sub-agents")
+    parser.add_argument("--task-id", required=True, help="Azure DevOps work item ID")
+    parser.add_argument("--parent-folder", required=True, help="folder the generated files are written to")
+    parser.add_argument("--concurrency", type=int, help="flows explored at the same time")
+    parser.add_argument("--profile", help="browser launch profile, e.g. 'fast' (see src/mcp_client/launch_profiles.py)")
+    args = parser.parse_args()
+
+    with open("prerequsites/credentials.json", "r", encoding="utf-8") as f:
+        credentials = json.load(f)
+
+    asyncio.run(profiled(
+        generate_tests(args.task_id, credentials, args.parent_folder, args.concurrency, args.profile), "generate"
+    ))
@@ -0,0 +1,332 @@
+# Process-wide rate limiting and retry scheduling for the OpenAI LLM calls.
+#
+# Every agent creates its own ChatOpenAI client, so concurrent runs (service workers,
+# batch sites, sub-agents) know nothing about each other and quickly run into the
+# requests-per-minute / tokens-per-minute limits. All LLM clients created with
+# `create_llm` share one token-bucket limiter:
+#   - a request waits until both the RPM and the TPM bucket can cover it, using an
+#     estimate of its prompt + completion tokens (corrected with the real usage after)
+#   - waiting requests are served by priority (interactive before batch), then FIFO
+#   - 429s / transient errors are retried with jittered exponential backoff, and a 429
+#     pauses every caller for the retry-after period so failures don't cascade
+import os
+import json
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+import openai
+from langchain_openai import ChatOpenAI
+
+INTERACTIVE = 0
+BATCH = 10
+
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute with priority queueing"""
+
+    def __init__(self, requests_per_minute: int = OPENAI_RPM, tokens_per_minute: int = OPENAI_TPM):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting: List[tuple] = []
+        self._counter = itertools.count()
+        # A threading lock so the limiter works across event loops and threads
+        self._lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "wait_seconds": 0.0,
+            "execute_seconds": 0.0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0,
+        }
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_rate)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+
+    def _enqueue(self, priority: int) -> tuple:
+        ticket = (priority, next(self._counter))
+        with self._lock:
+            heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: tuple):
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+
+    def _try_acquire(self, ticket: tuple, tokens: int) -> float:
+        """Take capacity if it's this ticket's turn; otherwise return how long to wait"""
+        tokens = min(tokens, self.token_capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._paused_until > now:
+                return self._paused_until - now
+            if self._waiting and self._waiting[0] != ticket:
+                # Someone with a higher priority (or earlier) is first in line
+                return 0.05
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                heapq.heappop(self._waiting)
+                self._metrics["requests"] += 1
+                self._metrics["estimated_tokens"] += tokens
+                return 0.0
+            wait_requests = (1 - self._requests) / self.request_rate if self._requests < 1 else 0.0
+            wait_tokens = (tokens - self._tokens) / self.token_rate if self._tokens < tokens else 0.0
+            return max(wait_requests, wait_tokens, 0.01)
+
+    def acquire(self, tokens: int, priority: int = INTERACTIVE):
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    break
+                time.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self.record("wait_seconds", time.monotonic() - started)
+
+    async def aacquire(self, tokens: int, priority: int = INTERACTIVE):
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self.record("wait_seconds", time.monotonic() - started)
+
+    def reconcile(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the real usage of a request is known"""
+        if actual is None:
+            return
+        with self._lock:
+            self._tokens = min(self.token_capacity, self._tokens + min(estimated, self.token_capacity) - actual)
+            self._metrics["actual_tokens"] += actual
+
+    def pause(self, seconds: float):
+        """Hold back every caller, used when the API answers 429"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._metrics["rate_limited"] += 1
+
+    def record(self, key: str, value: float):
+        with self._lock:
+            self._metrics[key] += value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["queue_depth"] = len(self._waiting)
+        metrics["wait_seconds"] = round(metrics["wait_seconds"], 3)
+        metrics["execute_seconds"] = round(metrics["execute_seconds"], 3)
+        return metrics
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
+
+
+def estimate_tokens(messages, kwargs: Dict[str, Any], max_tokens: Optional[int]) -> int:
+    """Rough token estimate of a chat request (~4 characters per token) plus the completion"""
+    chars = 0
+    for message in messages:
+        chars += len(str(message.content)) + len(json.dumps(message.additional_kwargs, default=str))
+    for key in ("functions", "tools"):
+        if kwargs.get(key):
+            chars += len(json.dumps(kwargs[key], default=str))
+    return chars // 4 + (max_tokens or 1024)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    retry_after = None
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+    # Full jitter, so retrying agents don't all come back at the same moment
+    backoff = random.uniform(0, min(60.0, 2.0 ** attempt))
+    return max(retry_after or 0.0, backoff)
+
+
+def _total_tokens(result) -> Optional[int]:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+def _chunk_tokens(chunk) -> Optional[int]:
+    # Streamed usage arrives on the last chunk (stream_usage / stream_options)
+    usage = getattr(chunk.message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose calls go through the shared rate limiter and retry scheduler"""
+
+    priority: int = INTERACTIVE
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = get_rate_limiter()
+        estimate = estimate_tokens(messages, kwargs, self.max_tokens)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            limiter.acquire(estimate, self.priority)
+            started = time.monotonic()
+            try:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                limiter.reconcile(estimate, 0)
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    limiter.pause(delay)
+                limiter.record("retries", 1)
+                time.sleep(delay)
+                continue
+            finally:
+                limiter.record("execute_seconds", time.monotonic() - started)
+            limiter.reconcile(estimate, _total_tokens(result))
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = get_rate_limiter()
+        estimate = estimate_tokens(messages, kwargs, self.max_tokens)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await limiter.aacquire(estimate, self.priority)
+            started = time.monotonic()
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                limiter.reconcile(estimate, 0)
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    limiter.pause(delay)
+                limiter.record("retries", 1)
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                limiter.record("execute_seconds", time.monotonic() - started)
+            limiter.reconcile(estimate, _total_tokens(result))
+            return result
+
+    # AgentExecutor streams the agent (stream_runnable), so its calls come through here.
+    # A request is only retried while none of its chunks have been handed out yet.
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = get_rate_limiter()
+        estimate = estimate_tokens(messages, kwargs, self.max_tokens)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            limiter.acquire(estimate, self.priority)
+            started = time.monotonic()
+            streamed, usage = False, None
+            try:
+                for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    usage = _chunk_tokens(chunk) or usage
+                    yield chunk
+            except RETRYABLE_ERRORS as e:
+                limiter.reconcile(estimate, 0)
+                if streamed or attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    limiter.pause(delay)
+                limiter.record("retries", 1)
+                time.sleep(delay)
+                continue
+            finally:
+                limiter.record("execute_seconds", time.monotonic() - started)
+            limiter.reconcile(estimate, usage)
+            return
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = get_rate_limiter()
+        estimate = estimate_tokens(messages, kwargs, self.max_tokens)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await limiter.aacquire(estimate, self.priority)
+            started = time.monotonic()
+            streamed, usage = False, None
+            try:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    usage = _chunk_tokens(chunk) or usage
+                    yield chunk
+            except RETRYABLE_ERRORS as e:
+                limiter.reconcile(estimate, 0)
+                if streamed or attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    limiter.pause(delay)
+                limiter.record("retries", 1)
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                limiter.record("execute_seconds", time.monotonic() - started)
+            limiter.reconcile(estimate, usage)
+            return
+
+
+def create_llm(model: str = "gpt-4o-mini", priority: int = INTERACTIVE, **kwargs) -> ChatOpenAI:
+    """Create a ChatOpenAI client that shares the process-wide rate limiter.
+
+    Args:
+        model: OpenAI model name
+        priority: INTERACTIVE or BATCH, interactive requests are served first when waiting
+    """
+    return RateLimitedChatOpenAI(
+        model=model,
+        temperature=0.0,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        # Retries are scheduled by the limiter, not by the OpenAI SDK
+        max_retries=0,
+        priority=priority,
+        **kwargs,
+    )
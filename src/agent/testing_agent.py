@@ -1,16 +1,16 @@
 from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
-import os
-from langchain_openai import ChatOpenAI
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+from src.agent.rate_limiter import create_llm, get_rate_limiter, INTERACTIVE
 
-from prompt.prompts import system_prompt
+from prompt.prompts import system_prompt, resumed_run_note, resumed_on_url, resumed_on_blank_page
 from src.mcp_client.playwright_mcp import PlaywrightMCPClient
 from src.tools.playwright_tools import create_langchain_tool
 from langchain.agents import AgentExecutor
 from src.tools.editor_tools import get_writer_tool
 from src.tools.get_user_story_tool import create_work_items_tool
+from src.tools.tool_selector import create_phased_functions_agent
+from src.tools.selector_index import get_selector_index, get_selector_lookup_tool
 from langchain_community.callbacks import get_openai_callback
 
 # Global MCP client instance
@@ -21,32 +21,22 @@ async def run_agent_task(agent_executor, task: str):
     result = await agent_executor.ainvoke({"input": task})
     return result
 
-async def test_agent(testing_prompt):
-    # Connect to Playwright MCP server
-    print("Connecting to Playwright MCP server...")
-    await mcp_client.connect()
-    
-    # Get available tools
-    print("Fetching available tools...")
-    mcp_tools = await mcp_client.list_tools()
-    print(f"Found {len(mcp_tools)} tools:")
-    for tool in mcp_tools:
-        print(f"  - {tool['name']}: {tool['description']}")
-    
+def create_test_agent_executor(mcp_client, mcp_tools, priority=INTERACTIVE, writer_tool=None):
+    """Build the tools, LLM and AgentExecutor for an already connected MCP client.
+
+    priority is the LLM rate limiter priority (INTERACTIVE or BATCH), writer_tool replaces
+    the file writer (e.g. get_draft_writer_tool() to keep files as drafts).
+    """
     # Convert MCP tools to LangChain tools
     langchain_tools = [create_langchain_tool(tool, mcp_client) for tool in mcp_tools]
-    editor_tool = [get_writer_tool()]
+    editor_tool = [writer_tool or get_writer_tool()]
     azdo_tool = [create_work_items_tool()]
+    selector_tool = [get_selector_lookup_tool(mcp_client)]
     
-    # Initialize LLM - Use ChatOpenAI with proper configuration
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.0,
-        openai_api_key=OPENAI_API_KEY
-    )
+    # Initialize LLM - shares the process-wide rate limiter
+    llm = create_llm(model="gpt-4o-mini", priority=priority)
     
-    # Use the OpenAI Functions agent instead of structured chat
-    from langchain.agents import create_openai_functions_agent
+    # Use the OpenAI Functions agent instead of structured chat, binding only the tools of the current phase
     from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
     
     prompt = ChatPromptTemplate.from_messages([
@@ -55,39 +45,123 @@ async def test_agent(testing_prompt):
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
     
-    agent = create_openai_functions_agent(llm, langchain_tools+editor_tool+azdo_tool, prompt)
+    max_iterations = 20
+    agent, tools = create_phased_functions_agent(
+        llm, langchain_tools+editor_tool+azdo_tool+selector_tool, prompt, max_iterations=max_iterations
+    )
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=langchain_tools+editor_tool+azdo_tool,
+        tools=tools,
         verbose=True,
         handle_parsing_errors=True,
-        max_iterations=20,
+        max_iterations=max_iterations,
         return_intermediate_steps=True
     )
+    return agent_executor
+
+async def run_with_checkpoint(agent_executor, inputs, checkpoint, stage, mcp_client=None):
+    """Run the agent step by step, checkpointing after every step and continuing a previous attempt
+
+    With the agent's mcp_client the page URL is saved with every step and a resumed run
+    starts back on the last one.
+    """
+    restored = checkpoint.steps(stage)
+    if restored:
+        print(f"Resuming '{stage}' after {len(restored)} recorded steps")
+        url = checkpoint.url(stage)
+        browser_state = resumed_on_blank_page
+        if url and mcp_client is not None:
+            try:
+                await mcp_client.call_tool("browser_navigate", {"url": url})
+                browser_state = resumed_on_url.format(url=url)
+            except Exception as e:
+                print(f"Could not navigate back to {url}: {e}")
+        inputs = {**inputs, "input": inputs["input"] + resumed_run_note.format(browser_state=browser_state)}
+    result = None
+    async for chunk in agent_executor.iter({**inputs, "restored_steps": restored}):
+        if "intermediate_step" in chunk:
+            for action, observation in chunk["intermediate_step"]:
+                url = mcp_client.page_state.tab.url if mcp_client is not None else None
+                checkpoint.record_step(stage, action, observation, url)
+        elif "output" in chunk:
+            result = dict(chunk)
+    result["intermediate_steps"] = restored + list(result.get("intermediate_steps", []))
+    result["restored_step_count"] = len(restored)
+    checkpoint.complete(stage, result.get("output"))
+    return result
+
+async def run_with_cost_tracking(agent_executor, testing_prompt, tool_phase=None, checkpoint=None, stage=None,
+                                 mcp_client=None):
+    """Invoke the agent and append its token usage and cost to cost_details.txt
+
+    tool_phase is the phase the run starts in (see src/tools/tool_selector.py), e.g. "execute"
+    for prompts that don't need the Azure DevOps lookup. With a checkpoint (see
+    src/agent/checkpoint.py) every step is saved under the given stage name, together with
+    the page URL of the agent's mcp_client.
+    """
+    cost_details = ""
+    inputs = {"input": testing_prompt, "tool_phase": tool_phase}
+    with get_openai_callback() as cb:
+        if checkpoint is not None:
+            result = await run_with_checkpoint(agent_executor, inputs, checkpoint, stage, mcp_client)
+        else:
+            result = await agent_executor.ainvoke(inputs)
+        try:
+            # Remember the selectors that worked (or failed) for the next runs
+            new_steps = result.get("intermediate_steps", [])[result.get("restored_step_count", 0):]
+            learned = get_selector_index().learn_from_steps(new_steps)
+            print(f"Selector index: recorded {learned} selector uses")
+        except Exception as e:
+            print(f"Could not update the selector index: {e}")
+        cost_details += f"""
+        {"-"*20}
+        Agent execution time: {datetime.now().isoformat()}
+        Total Tokens: {cb.total_tokens}
+        Prompt Tokens: {cb.prompt_tokens}
+        Completion Tokens: {cb.completion_tokens}
+        Total Cost (USD): ${cb.total_cost}
+        LLM Rate Limiter: {get_rate_limiter().metrics()}
+        {"-"*20}
+        """
+        with open("cost_details.txt", "a", encoding="utf-8") as f:
+            f.write(cost_details)
+        print("\nResult:", result.get("output", result))
+        print("\nCost Details:")
+        print(cost_details)
+        return result
+
+async def test_agent(testing_prompt, storage_state=None, tool_phase=None, checkpoint=None, stage=None):
+    # Start from a saved authenticated session if one is given, otherwise use the shared client
+    client = PlaywrightMCPClient(storage_state=storage_state) if storage_state else mcp_client
+
+    # Connect to Playwright MCP server
+    print("Connecting to Playwright MCP server...")
+    await client.connect()
+    
+    # Get available tools
+    print("Fetching available tools...")
+    mcp_tools = await client.list_tools()
+    print(f"Found {len(mcp_tools)} tools:")
+    for tool in mcp_tools:
+        print(f"  - {tool['name']}: {tool['description']}")
+    
+    agent_executor = create_test_agent_executor(client, mcp_tools)
+    client.page_state.begin_conversation()
+    if checkpoint is not None:
+        checkpoint.start(stage, storage_state)
 
     try:
-        cost_details = ""
-        with get_openai_callback() as cb:
-            result = await agent_executor.ainvoke({"input": testing_prompt})
-            cost_details += f"""
-            {"-"*20}
-            Agent execution time: {datetime.now().isoformat()}
-            Total Tokens: {cb.total_tokens}
-            Prompt Tokens: {cb.prompt_tokens}
-            Completion Tokens: {cb.completion_tokens}
-            Total Cost (USD): ${cb.total_cost}
-            {"-"*20}
-            """
-            with open("cost_details.txt", "a", encoding="utf-8") as f:
-                f.write(cost_details)
-            print("\nResult:", result.get("output", result))
-            print("\nCost Details:")
-            print(cost_details)
-            return result
+        return await run_with_cost_tracking(agent_executor, testing_prompt, tool_phase, checkpoint, stage, client)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        print(f"Page state cache: {client.page_state.stats()}")
+        if storage_state:
+            # The restored-session client is per call; the shared client keeps its old lifecycle
+            await client.disconnect()
     
-    # Cleanup
-    await mcp_client.disconnect()
\ No newline at end of file
+    # Cleanup (the restored-session client is already disconnected above)
+    if not storage_state:
+        await client.disconnect()
\ No newline at end of file
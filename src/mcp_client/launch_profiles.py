@@ -0,0 +1,192 @@
+# Launch profiles for the Playwright MCP server.
+#
+# A profile decides how `npx @playwright/mcp` is started: the pinned server version (so
+# npx does not re-resolve "@latest" on every launch), headless mode, viewport size and
+# which requests are blocked. The MCP server can only block whole origins
+# (--blocked-origins), not resource types, so images are switched off through a Chromium
+# launch flag instead and analytics/ads are blocked by origin. Fonts and media from the
+# site's own origin are still loaded.
+#
+# Select a profile with PLAYWRIGHT_MCP_PROFILE=<name> (default: "default"), pin the server
+# with PLAYWRIGHT_MCP_VERSION=<version>, and compare page loads with and without a profile:
+#   python -m src.mcp_client.launch_profiles --compare https://parabank.parasoft.com --profile fast
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Pinned so npx resolves the package from its cache instead of the registry on every launch
+PLAYWRIGHT_MCP_VERSION = os.getenv("PLAYWRIGHT_MCP_VERSION", "0.0.41")
+
+# Third party analytics, ads and tracking origins that never matter for a functional test
+ANALYTICS_ORIGINS = [
+    "https://www.google-analytics.com",
+    "https://ssl.google-analytics.com",
+    "https://region1.google-analytics.com",
+    "https://www.googletagmanager.com",
+    "https://stats.g.doubleclick.net",
+    "https://googleads.g.doubleclick.net",
+    "https://pagead2.googlesyndication.com",
+    "https://connect.facebook.net",
+    "https://static.hotjar.com",
+    "https://script.hotjar.com",
+    "https://cdn.segment.com",
+    "https://api.segment.io",
+    "https://js.hs-analytics.net",
+    "https://cdn.mxpnl.com",
+    "https://bat.bing.com",
+    "https://snap.licdn.com",
+]
+
+
+@dataclass(frozen=True)
+class LaunchProfile:
+    name: str
+    version: str = PLAYWRIGHT_MCP_VERSION
+    headless: bool = False
+    viewport: Optional[Tuple[int, int]] = None
+    blocked_origins: List[str] = field(default_factory=list)
+    block_images: bool = False
+    # Extra Chromium command line flags
+    browser_args: List[str] = field(default_factory=list)
+    # Extra environment variables for the server process
+    env: Dict[str, str] = field(default_factory=dict)
+
+    def config(self) -> Dict:
+        """Playwright MCP config file content for the browser launch and context options"""
+        launch_args = list(self.browser_args)
+        if self.block_images:
+            launch_args.append("--blink-settings=imagesEnabled=false")
+        browser = {"launchOptions": {"headless": self.headless}}
+        if launch_args:
+            browser["launchOptions"]["args"] = launch_args
+        if self.viewport:
+            browser["contextOptions"] = {"viewport": {"width": self.viewport[0], "height": self.viewport[1]}}
+        return {"browser": browser}
+
+    def config_path(self) -> str:
+        path = os.path.join(tempfile.gettempdir(), f"playwright-mcp-{self.name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.config(), f, indent=2)
+        return path
+
+    def server_args(self) -> List[str]:
+        """npx arguments starting the MCP server with this profile"""
+        args = ["-y", f"@playwright/mcp@{self.version}"]
+        if self.headless:
+            args.append("--headless")
+        if self.blocked_origins:
+            args.append(f"--blocked-origins={';'.join(self.blocked_origins)}")
+        if self.viewport or self.block_images or self.browser_args:
+            args.append(f"--config={self.config_path()}")
+        return args
+
+    def server_env(self) -> Optional[Dict[str, str]]:
+        # None lets the MCP SDK pass its default environment, as before
+        return {**os.environ, **self.env} if self.env else None
+
+
+PROFILES: Dict[str, LaunchProfile] = {
+    # Headed browser with everything loaded: the server's default options, on the pinned version
+    "default": LaunchProfile(name="default"),
+    # Headless, fixed viewport, no images and no analytics: batch runs and the agent service
+    "fast": LaunchProfile(
+        name="fast",
+        headless=True,
+        viewport=(1280, 720),
+        blocked_origins=ANALYTICS_ORIGINS,
+        block_images=True,
+        browser_args=["--disable-extensions", "--mute-audio", "--autoplay-policy=user-gesture-required"],
+    ),
+    # Headless but otherwise identical to the real page, e.g. for screenshots in CI
+    "headless": LaunchProfile(name="headless", headless=True, viewport=(1280, 720)),
+}
+
+
+def get_launch_profile(profile: "str | LaunchProfile | None" = None) -> LaunchProfile:
+    """Resolve a profile by name, defaulting to PLAYWRIGHT_MCP_PROFILE"""
+    if isinstance(profile, LaunchProfile):
+        return profile
+    name = profile or os.getenv("PLAYWRIGHT_MCP_PROFILE", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown launch profile '{name}'. Use one of: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+_TIMING_FUNCTION = """() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const resources = performance.getEntriesByType('resource');
+  return {
+    domContentLoaded: nav ? Math.round(nav.domContentLoadedEventEnd) : null,
+    load: nav ? Math.round(nav.loadEventEnd) : null,
+    resources: resources.length,
+    transferKB: Math.round(resources.reduce((sum, r) => sum + (r.transferSize || 0), 0) / 1024),
+  };
+}"""
+
+
+def _parse_evaluate(response: str) -> Dict:
+    text = "\n".join(item.get("text", "") for item in json.loads(response))
+    # The value is printed under "### Result", before the code that produced it
+    result = text.split("### Result", 1)[-1].split("###", 1)[0]
+    try:
+        return json.loads(result[result.find("{"):result.rfind("}") + 1])
+    except ValueError:
+        return {}
+
+
+async def measure_page_loads(profile: LaunchProfile, url: str, runs: int = 3) -> List[Dict]:
+    """Start a server with the profile and time `runs` navigations to the url"""
+    from src.mcp_client.playwright_mcp import PlaywrightMCPClient
+
+    # Isolated (in-memory profile), so a profile measured after another does not start from its warm HTTP cache
+    client = PlaywrightMCPClient(profile=profile, isolated=True)
+    await client.connect()
+    timings = []
+    try:
+        for _ in range(runs):
+            # Navigating to the current URL again is skipped by the page state tracker
+            client.page_state.reset()
+            started = time.perf_counter()
+            await client.call_tool("browser_navigate", {"url": url})
+            navigate_ms = round((time.perf_counter() - started) * 1000)
+            metrics = _parse_evaluate(await client.call_tool("browser_evaluate", {"function": _TIMING_FUNCTION}))
+            timings.append({"navigate": navigate_ms, **metrics})
+    finally:
+        await client.disconnect()
+    return timings
+
+
+def _median(values: List) -> Optional[float]:
+    values = sorted(v for v in values if v is not None)
+    return values[len(values) // 2] if values else None
+
+
+async def compare_profiles(url: str, profile: str, baseline: str = "default", runs: int = 3):
+    results = {}
+    for name in (baseline, profile):
+        print(f"Measuring '{name}' profile...")
+        results[name] = await measure_page_loads(get_launch_profile(name), url, runs)
+
+    columns = ("navigate", "domContentLoaded", "load", "resources", "transferKB")
+    print(f"\nMedian of {runs} page loads of {url}")
+    print(f"{'profile':<12}" + "".join(f"{c:>18}" for c in columns))
+    for name, timings in results.items():
+        print(f"{name:<12}" + "".join(f"{str(_median([t.get(c) for t in timings])):>18}" for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Playwright MCP launch profiles")
+    parser.add_argument("--compare", metavar="URL", help="Compare page load timings with and without a profile")
+    parser.add_argument("--profile", default="fast", help="Profile to compare against the default one")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    if args.compare:
+        asyncio.run(compare_profiles(args.compare, args.profile, runs=args.runs))
+    else:
+        for profile in PROFILES.values():
+            print(f"{profile.name}: npx {' '.join(profile.server_args())}")
@@ -0,0 +1,119 @@
+# Persistent background event loop for running MCP coroutines from synchronous code.
+#
+# MCP sessions are bound to the event loop that opened them. Synchronous callers (the
+# sync `func` of the LangChain tools, thread pool executors) must therefore submit their
+# coroutine to that loop instead of spinning up a new loop per call. Clients remember
+# the loop they connected on (`mcp_client.loop`); clients connected from sync code live
+# on a single long-lived bridge loop thread:
+#
+#   bridge = get_loop_bridge()
+#   bridge.run(mcp_client.connect())
+#   tool.run({...})        # from any thread
+import os
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Awaitable, Optional
+
+MCP_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "120"))
+
+
+class LoopBridge:
+    """An event loop running forever in a daemon thread, accepting work from any thread"""
+
+    def __init__(self, name: str = "mcp-loop-bridge"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def _run():
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                self._loop = loop
+                ready.set()
+                try:
+                    loop.run_forever()
+                finally:
+                    loop.run_until_complete(loop.shutdown_asyncgens())
+                    loop.close()
+
+            self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+            self._thread = None
+            self._loop = None
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        return run_on_loop(coro, self.loop, timeout)
+
+
+def run_on_loop(coro: Awaitable, loop: asyncio.AbstractEventLoop, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on a loop owned by another thread and wait for its result.
+
+    On timeout the coroutine is cancelled on its loop and TimeoutError is raised.
+    """
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("Blocking on the event loop from its own thread would deadlock, use the async API")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Timed out after {timeout}s")
+
+
+_bridge: Optional[LoopBridge] = None
+_bridge_lock = threading.Lock()
+
+
+def get_loop_bridge() -> LoopBridge:
+    """Return the process-wide loop bridge, starting its thread on first use"""
+    global _bridge
+    with _bridge_lock:
+        if _bridge is None:
+            _bridge = LoopBridge()
+        _bridge.start()
+        return _bridge
+
+
+def run_sync(coro: Awaitable, loop: Optional[asyncio.AbstractEventLoop] = None,
+             timeout: Optional[float] = MCP_TOOL_TIMEOUT) -> Any:
+    """Run a coroutine from synchronous code on the loop that owns the MCP session.
+
+    Raises RuntimeError if the client never connected or its loop is no longer running: the
+    session can't be used from another loop, connect it on the bridge loop instead
+    (`get_loop_bridge().run(mcp_client.connect())`).
+    """
+    if loop is None or loop.is_closed() or not loop.is_running():
+        coro.close()
+        if loop is None:
+            raise RuntimeError("The MCP client is not connected, connect it before calling its tools")
+        raise RuntimeError("The event loop that owns the MCP session is no longer running, "
+                           "connect the client again (e.g. on get_loop_bridge().loop) before calling its tools")
+    return run_on_loop(coro, loop, timeout)
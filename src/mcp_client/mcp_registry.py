@@ -1,35 +1,248 @@
 import json
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional
 from mcp_registry import ServerRegistry, MCPAggregator, get_config_path
+from src.mcp_client.page_state import PageStateTracker
 
-async def get_mcp_client():
-    """Create and return an MCP client connected to the aggregator"""
-    # Connect to MCP registry and aggregator
-    print("Connecting to MCP registry and aggregators...")
-    registry = ServerRegistry.from_config(get_config_path())
-
-    async with MCPAggregator(registry) as aggregator:
-        # Discover tools via aggregator
-        results = await aggregator.list_tools()
-        mcp_tools = [
+# Seconds between health checks of the pooled server connections
+HEALTH_CHECK_INTERVAL = 30
+HEALTH_CHECK_TIMEOUT = 10
+# MCPAggregator.call_tool never raises: a call that failed on the connection itself (server
+# process or stdio streams gone) comes back as an error result starting with this text
+CONNECTION_ERROR_PREFIX = "Error in call_tool for"
+
+
+def _server_names(registry) -> List[str]:
+    if hasattr(registry, "list_servers"):
+        return list(registry.list_servers())
+    return list(registry.registry.keys())
+
+
+def _connection_failed(result) -> bool:
+    if not getattr(result, "isError", False):
+        return False
+    message = getattr(result, "message", "") or "".join(
+        getattr(item, "text", "") for item in getattr(result, "content", None) or []
+    )
+    return message.startswith(CONNECTION_ERROR_PREFIX)
+
+
+class ServerConnection:
+    """A long-lived connection to a single MCP server of the registry"""
+
+    def __init__(self, registry, name: str):
+        self.registry = registry
+        self.name = name
+        self.aggregator = None
+        self.tools: List[Dict[str, Any]] = []
+        # Incremented on every (re)start so concurrent callers restart a dead server only once
+        self.generation = 0
+        self._restart_lock = asyncio.Lock()
+        # Like PlaywrightMCPClient, the aggregator context is entered and exited in one
+        # dedicated task to avoid AnyIO "exit cancel scope in a different task" errors.
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+
+        async def _runner():
+            try:
+                async with MCPAggregator(self.registry.filter_servers([self.name])) as aggregator:
+                    self.aggregator = aggregator
+                    self._ready.set()
+                    await self._stop.wait()
+            finally:
+                self.aggregator = None
+                # Unblock start() if the server failed before becoming ready
+                self._ready.set()
+
+        self.generation += 1
+        self._task = asyncio.create_task(_runner())
+        await self._ready.wait()
+        if self.aggregator is None:
+            # Surface the startup error
+            await self._task
+
+    async def stop(self):
+        if self._stop and self._task:
+            self._stop.set()
+            try:
+                await self._task
+            except Exception:
+                pass
+        self._task = None
+
+    async def restart(self, generation: Optional[int] = None):
+        """Restart the server, unless it was already restarted since `generation`"""
+        async with self._restart_lock:
+            if generation is not None and generation != self.generation:
+                return
+            print(f"Restarting MCP server '{self.name}'...")
+            await self.stop()
+            await self.start()
+
+    async def discover(self) -> List[Dict[str, Any]]:
+        results = await self.aggregator.list_tools()
+        self.tools = [
             {"name": t.name, "description": t.description or "", "schema": t.inputSchema or {}}
             for t in results.tools
         ]
-        print(f"Found {len(mcp_tools)} tools:")
-        for tool in mcp_tools:
-            print(f"  - {tool['name']}: {tool['description']}")
-
-        # Adapter to match existing PlaywrightMCPClient.call_tool shape
-        class AggregatorClient:
-            def __init__(self, aggregator):
-                self.aggregator = aggregator
-
-            async def call_tool(self, tool_name: str, arguments: dict) -> str:
-                res = await self.aggregator.call_tool(tool_name, arguments)
-                # Try to convert MCP return items to JSON similar to Playwright client
-                try:
-                    return json.dumps([item.model_dump() for item in res.content])
-                except Exception:
-                    return json.dumps(res.content if hasattr(res, "content") else res)
-
-        mcp_client = AggregatorClient(aggregator)
-        return mcp_client, mcp_tools
\ No newline at end of file
+        return self.tools
+
+
+class MCPAggregatorPool:
+    """Keeps one connection per registered MCP server open for the lifetime of the process.
+
+    Tools of all servers are discovered in parallel, calls are routed to the owning
+    server without a shared lock, and crashed servers are restarted by a health check.
+    """
+
+    def __init__(self):
+        self.connections: Dict[str, ServerConnection] = {}
+        self.tool_routes: Dict[str, ServerConnection] = {}
+        self.tools: List[Dict[str, Any]] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        print("Connecting to MCP registry and aggregators...")
+        self.loop = asyncio.get_running_loop()
+        registry = ServerRegistry.from_config(get_config_path())
+        self.connections = {name: ServerConnection(registry, name) for name in _server_names(registry)}
+
+        # Start and discover all servers in parallel instead of one after the other
+        results = await asyncio.gather(
+            *(self._start_and_discover(conn) for conn in self.connections.values()),
+            return_exceptions=True,
+        )
+        for conn, result in zip(self.connections.values(), results):
+            if isinstance(result, Exception):
+                print(f"  ! MCP server '{conn.name}' failed to start: {result}")
+        self._rebuild_routes()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _start_and_discover(self, conn: ServerConnection):
+        await conn.start()
+        await conn.discover()
+
+    def _rebuild_routes(self):
+        self.tool_routes = {}
+        self.tools = []
+        for conn in self.connections.values():
+            for tool in conn.tools:
+                self.tool_routes[tool["name"]] = conn
+                self.tools.append(tool)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            await asyncio.gather(*(self._check(conn) for conn in self.connections.values()))
+
+    async def _check(self, conn: ServerConnection):
+        try:
+            if not conn.alive or conn.aggregator is None:
+                raise RuntimeError("connection closed")
+            await asyncio.wait_for(conn.aggregator.list_tools(), HEALTH_CHECK_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"MCP server '{conn.name}' is unhealthy: {e}")
+            try:
+                await conn.restart()
+                await conn.discover()
+                self._rebuild_routes()
+            except Exception as restart_error:
+                print(f"  ! Could not restart MCP server '{conn.name}': {restart_error}")
+
+    async def call_tool(self, tool_name: str, arguments: dict):
+        conn = self.tool_routes.get(tool_name)
+        if conn is None:
+            raise ValueError(f"Unknown MCP tool: {tool_name}")
+        generation = conn.generation
+        if not conn.alive or conn.aggregator is None:
+            await conn.restart(generation)
+            generation = conn.generation
+        result = await conn.aggregator.call_tool(tool_name, arguments)
+        if _connection_failed(result):
+            # The server died under us: restart it once and retry the call
+            await conn.restart(generation)
+            result = await conn.aggregator.call_tool(tool_name, arguments)
+        return result
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await asyncio.gather(*(conn.stop() for conn in self.connections.values()), return_exceptions=True)
+
+
+_pool: Optional[MCPAggregatorPool] = None
+_pool_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+async def get_mcp_pool() -> MCPAggregatorPool:
+    """Return the process-wide aggregator pool, starting it on first use"""
+    global _pool
+    loop = asyncio.get_running_loop()
+    lock = _pool_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        # Connections are bound to the loop that opened them (e.g. each asyncio.run in main.py)
+        if _pool is None or _pool.loop is not loop or _pool.loop.is_closed():
+            _pool = MCPAggregatorPool()
+            await _pool.start()
+        return _pool
+
+
+async def close_mcp_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# Adapter to match existing PlaywrightMCPClient.call_tool shape
+class AggregatorClient:
+    def __init__(self, pool: MCPAggregatorPool):
+        self.pool = pool
+        # Event loop the pooled sessions live on, sync callers submit their calls to it
+        self.loop = pool.loop
+        self.page_state = PageStateTracker()
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> str:
+        cached = self.page_state.before_call(tool_name, arguments)
+        if cached is not None:
+            return cached
+        res = await self.pool.call_tool(tool_name, arguments)
+        # Try to convert MCP return items to JSON similar to Playwright client
+        try:
+            response = json.dumps([item.model_dump() for item in res.content])
+        except Exception:
+            response = json.dumps(res.content if hasattr(res, "content") else res)
+        self.page_state.after_call(tool_name, arguments, response)
+        return response
+
+    async def disconnect(self):
+        """The pooled connections stay open for the next agent, use close_mcp_pool() to shut them down"""
+        self.page_state.reset()
+
+
+async def get_mcp_client():
+    """Create and return an MCP client connected to the pooled aggregator"""
+    pool = await get_mcp_pool()
+    mcp_tools = list(pool.tools)
+    print(f"Found {len(mcp_tools)} tools:")
+    for tool in mcp_tools:
+        print(f"  - {tool['name']}: {tool['description']}")
+    return AggregatorClient(pool), mcp_tools
@@ -0,0 +1,175 @@
+# Page state tracking for the Playwright MCP client.
+#
+# Every Playwright MCP response carries the page URL and an accessibility snapshot of
+# the page. We remember the last one per tab together with a fingerprint of it, so we
+# can answer without touching the browser when:
+#   - the agent navigates to the URL the tab is already showing, and nothing was done
+#     on the page since it was loaded (typical at the start of every scenario)
+#   - the agent asks for a snapshot and nothing happened since the last one
+import re
+import json
+import hashlib
+from typing import Any, Dict, Optional
+
+# Tools that only observe the page and never change it
+READ_ONLY_TOOLS = {
+    "browser_snapshot",
+    "browser_take_screenshot",
+    "browser_console_messages",
+    "browser_network_requests",
+    "browser_tab_list",
+}
+TAB_TOOLS = {"browser_tabs", "browser_tab_select", "browser_tab_new", "browser_tab_close"}
+
+_URL_RE = re.compile(r"^- Page URL: (\S+)", re.MULTILINE)
+_SNAPSHOT_RE = re.compile(r"- Page Snapshot:\s*```yaml\n(.*?)```", re.DOTALL)
+_JSESSIONID_RE = re.compile(r";jsessionid=[^?#/]*", re.IGNORECASE)
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for comparison: drop the fragment, session ids and a trailing slash"""
+    url = _JSESSIONID_RE.sub("", url.split("#", 1)[0])
+    return url[:-1] if url.endswith("/") else url
+
+
+def _base_tool_name(tool_name: str) -> str:
+    # The MCP registry aggregator namespaces tools as "<server>__<tool>"
+    return tool_name.rsplit("__", 1)[-1]
+
+
+def _response_text(response: str) -> str:
+    try:
+        items = json.loads(response)
+        return "\n".join(item.get("text", "") for item in items if isinstance(item, dict))
+    except (ValueError, TypeError, AttributeError):
+        return response if isinstance(response, str) else ""
+
+
+class TabState:
+    def __init__(self):
+        self.url: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.snapshot: Optional[str] = None
+        # No action was performed on the page since it was loaded
+        self.pristine = False
+        # No action was performed on the page since the snapshot was taken
+        self.fresh = False
+
+
+class PageStateTracker:
+    """Tracks the current URL and snapshot fingerprint per tab and serves cached observations"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.tabs: Dict[int, TabState] = {}
+        self.current_tab = 0
+        self.hits = {"browser_navigate": 0, "browser_snapshot": 0}
+        self.misses = {"browser_navigate": 0, "browser_snapshot": 0}
+        self.chars_saved = 0
+        # Fingerprints already shown to the current agent conversation
+        self._served = set()
+
+    @property
+    def tab(self) -> TabState:
+        return self.tabs.setdefault(self.current_tab, TabState())
+
+    def reset(self):
+        self.tabs.clear()
+        self.current_tab = 0
+        self._served.clear()
+
+    def begin_conversation(self):
+        """Call when a new agent run starts: it has not seen any snapshot yet"""
+        self._served.clear()
+
+    def _cached_response(self, note: str, include_snapshot: bool) -> str:
+        tab = self.tab
+        text = f"### Result\n{note}\n\n### Page state\n- Page URL: {tab.url}\n"
+        if include_snapshot:
+            text += f"- Page Snapshot:\n```yaml\n{tab.snapshot}```\n"
+        else:
+            text += f"- Page Snapshot: unchanged (fingerprint {tab.fingerprint}), refs from that snapshot are still valid\n"
+        self._served.add(tab.fingerprint)
+        return json.dumps([{"type": "text", "text": text}])
+
+    def before_call(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """Return a cached response if the call would not change anything, else None"""
+        if not self.enabled:
+            return None
+        tool = _base_tool_name(tool_name)
+        tab = self.tab
+        if tool == "browser_navigate":
+            url = (arguments or {}).get("url", "")
+            if tab.pristine and tab.snapshot and url and tab.url and normalize_url(url) == normalize_url(tab.url):
+                self.hits[tool] += 1
+                return self._cached_response(
+                    f"Already on {tab.url} and the page was not changed since it was loaded, navigation skipped.",
+                    include_snapshot=True,
+                )
+            self.misses[tool] += 1
+        elif tool == "browser_snapshot":
+            if tab.fresh and tab.snapshot:
+                self.hits[tool] += 1
+                # The agent already has this exact snapshot in its context, don't resend it
+                seen = tab.fingerprint in self._served
+                if seen:
+                    self.chars_saved += len(tab.snapshot)
+                return self._cached_response("The page did not change since the last snapshot.", include_snapshot=not seen)
+            self.misses[tool] += 1
+        return None
+
+    def after_call(self, tool_name: str, arguments: Dict[str, Any], response: str):
+        """Update the tab state from a real tool response"""
+        if not self.enabled:
+            return
+        tool = _base_tool_name(tool_name)
+        if tool in TAB_TOOLS:
+            action = (arguments or {}).get("action", "")
+            index = (arguments or {}).get("index")
+            if tool == "browser_tab_select" or (tool == "browser_tabs" and action == "select"):
+                try:
+                    self.current_tab = int(index)
+                except (TypeError, ValueError):
+                    self.reset()
+            elif not (tool == "browser_tabs" and action == "list"):
+                # Opening or closing tabs shifts the indices, start over
+                self.reset()
+            return
+
+        tab = self.tab
+        read_only = tool in READ_ONLY_TOOLS
+        if tool == "browser_navigate":
+            tab.pristine = True
+        elif not read_only:
+            tab.pristine = False
+
+        text = _response_text(response)
+        url = _URL_RE.search(text)
+        snapshot = _SNAPSHOT_RE.search(text)
+        if url:
+            if tab.url and normalize_url(url.group(1)) != normalize_url(tab.url) and tool != "browser_navigate":
+                # Navigated away by a click or a redirect
+                tab.pristine = False
+            tab.url = url.group(1)
+        if snapshot:
+            tab.snapshot = snapshot.group(1)
+            tab.fingerprint = hashlib.sha1(f"{normalize_url(tab.url or '')}\n{tab.snapshot}".encode("utf-8")).hexdigest()[:12]
+            tab.fresh = True
+            self._served.add(tab.fingerprint)
+        elif not read_only:
+            tab.fresh = False
+        if tool == "browser_navigate" and not snapshot:
+            # Failed or partial navigation, don't trust the page for a later short-circuit
+            tab.pristine = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit rates per tool and the number of snapshot characters not re-sent to the agent"""
+        stats: Dict[str, Any] = {"chars_saved": self.chars_saved}
+        for tool in self.hits:
+            total = self.hits[tool] + self.misses[tool]
+            stats[tool] = {
+                "hits": self.hits[tool],
+                "misses": self.misses[tool],
+                "hit_rate": round(self.hits[tool] / total, 3) if total else 0.0,
+            }
+        return stats
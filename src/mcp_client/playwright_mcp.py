@@ -22,10 +22,25 @@ import asyncio
 from typing import List, Dict, Any
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from src.mcp_client.page_state import PageStateTracker
+from src.mcp_client.launch_profiles import LaunchProfile, get_launch_profile
 
 # MCP Client wrapper for Playwright
 class PlaywrightMCPClient:
-    def __init__(self):
+    def __init__(self, storage_state: str | None = None, profile: str | LaunchProfile | None = None,
+                 isolated: bool = False):
+        # Server version, headless mode, viewport and request blocking,
+        # see src/mcp_client/launch_profiles.py
+        self.profile = get_launch_profile(profile)
+        # Optional Playwright storage state file (cookies, localStorage) to start from,
+        # see src/mcp_client/session_state.py
+        self.storage_state = storage_state
+        # In-memory browser profile, needed to run several clients side by side
+        self.isolated = isolated or bool(storage_state)
+        # Current URL and snapshot fingerprint per tab, used to skip no-op navigations/snapshots
+        self.page_state = PageStateTracker()
+        # Event loop the session was opened on, sync callers submit their calls to it
+        self.loop: asyncio.AbstractEventLoop | None = None
         self.session = None
         self.client = None
         # Background task and sync primitives used to ensure the stdio
@@ -36,6 +51,8 @@ class PlaywrightMCPClient:
         
     async def connect(self):
         """Connect to the Playwright MCP server"""
+        # Every connection starts a new browser on about:blank, forget the previous run's pages
+        self.page_state.reset()
         import shutil
         import os
         
@@ -64,18 +81,25 @@ class PlaywrightMCPClient:
                 "3. Verify with: npx --version"
             )
         
-        print(f"Using npx at: {npx_path}")
+        print(f"Using npx at: {npx_path} (launch profile: {self.profile.name})")
         
+        args = self.profile.server_args()
+        if self.isolated:
+            args.append("--isolated")
+        if self.storage_state:
+            # Storage state is only loaded into isolated (in-memory profile) contexts
+            args.append(f"--storage-state={self.storage_state}")
         server_params = StdioServerParameters(
             command=npx_path,
-            args=["@playwright/mcp@latest"],
-            env=None
+            args=args,
+            env=self.profile.server_env()
         )
         # Run the stdio_client inside a dedicated asyncio task so that the
         # asynccontextmanager is entered and exited from the same task. This
         # avoids AnyIO errors like "Attempted to exit cancel scope in a
         # different task than it was entered in" which happen when the
         # generator is closed from a different task.
+        self.loop = asyncio.get_running_loop()
         self._stdio_ready = asyncio.Event()
         self._stdio_stop = asyncio.Event()
 
@@ -103,6 +127,7 @@ class PlaywrightMCPClient:
         
     async def disconnect(self):
         """Disconnect from the MCP server"""
+        self.page_state.reset()
         # Close the MCP session first
         if self.session:
             try:
@@ -130,5 +155,10 @@ class PlaywrightMCPClient:
     
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
         """Call a tool on the MCP server"""
+        cached = self.page_state.before_call(tool_name, arguments)
+        if cached is not None:
+            return cached
         result = await self.session.call_tool(tool_name, arguments)
-        return json.dumps([item.model_dump() for item in result.content])
+        response = json.dumps([item.model_dump() for item in result.content])
+        self.page_state.after_call(tool_name, arguments, response)
+        return response
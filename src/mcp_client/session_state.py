@@ -0,0 +1,154 @@
+# Cache of authenticated browser storage state (cookies, localStorage) per credential set.
+#
+# A scenario that only needs to *start* logged in does not have to spend LLM turns on
+# navigate -> type username -> type password -> click. We log in once with Playwright
+# directly, save the storage state and hand it to the Playwright MCP server with
+# `--isolated --storage-state <file>` for the following scenarios.
+#
+# How to log in is part of each credential set in prerequsites/credentials.json:
+#   "valid_user": {"username": ..., "password": ..., "login": {"url": ..., "username_selector": ...,
+#                  "password_selector": ..., "submit_selector": ..., "success_selector": ...}}
+# A session is only restored for a feature on the same host as the login URL.
+import os
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from utils.get_parent_folder import get_site_key
+
+SESSION_STATE_DIR = os.getenv("SESSION_STATE_DIR", ".session_state")
+SESSION_STATE_TTL = float(os.getenv("SESSION_STATE_TTL_MINUTES", "20")) * 60
+LOGIN_RECIPE_KEYS = ("url", "username_selector", "password_selector", "submit_selector", "success_selector")
+
+
+def credential_for_tags(tags: List[str], default: str = "valid_user") -> Optional[str]:
+    """Return the credential set a scenario should start logged in with, based on its tags.
+
+    `@authenticated` uses the default credential set, `@auth:<name>` picks a specific one
+    from prerequsites/credentials.json. Returns None if the scenario needs a cold start.
+    """
+    for tag in tags:
+        if tag.startswith("@auth:"):
+            return tag[len("@auth:"):]
+        if tag == "@authenticated":
+            return default
+    return None
+
+
+def login_recipe(credentials: Dict[str, Dict[str, Any]], credential_name: str,
+                 feature: str) -> Optional[Dict[str, str]]:
+    """Return the login recipe of a credential set if it logs in to the site the feature targets.
+
+    The feature's site is the host of its first URL; None if the credential set has no
+    (complete) recipe, the feature has no URL or the hosts differ.
+    """
+    recipe = (credentials.get(credential_name) or {}).get("login")
+    if not isinstance(recipe, dict) or any(not recipe.get(key) for key in LOGIN_RECIPE_KEYS):
+        return None
+    target = get_site_key(feature)
+    if target is None or get_site_key(recipe["url"]) != target:
+        return None
+    return recipe
+
+
+class SessionStateCache:
+    """Stores one Playwright storage state file per (site, credential set)"""
+
+    def __init__(self, directory: str = SESSION_STATE_DIR, ttl: float = SESSION_STATE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _key(self, credential_name: str, url: str, username: str) -> str:
+        digest = hashlib.sha1(f"{url}|{username}".encode("utf-8")).hexdigest()[:10]
+        return f"{credential_name}-{digest}"
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return f"{base}.json", f"{base}.meta.json"
+
+    def get(self, credential_name: str, url: str, username: str) -> Optional[str]:
+        """Return the path of a still valid storage state file, or None"""
+        state_path, meta_path = self._paths(self._key(credential_name, url, username))
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        now = time.time()
+        if now - meta.get("created_at", 0) > self.ttl:
+            self.invalidate(credential_name, url, username)
+            return None
+        # Cookies with an expiry (-1 means session cookie) must all still be valid
+        for cookie in state.get("cookies", []):
+            expires = cookie.get("expires", -1)
+            if expires is not None and expires > 0 and expires <= now:
+                self.invalidate(credential_name, url, username)
+                return None
+        return state_path
+
+    def save(self, credential_name: str, url: str, username: str, state: Dict[str, Any]) -> str:
+        """Persist a storage state captured after a successful login"""
+        os.makedirs(self.directory, exist_ok=True)
+        state_path, meta_path = self._paths(self._key(credential_name, url, username))
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"credential": credential_name, "url": url, "created_at": time.time()}, f)
+        return state_path
+
+    def invalidate(self, credential_name: str, url: str, username: str):
+        """Drop the cached state, e.g. when the site logged the session out"""
+        for path in self._paths(self._key(credential_name, url, username)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def ensure(self, credential_name: str, credentials: Dict[str, Dict[str, str]],
+                     recipe: Optional[Dict[str, str]] = None) -> str:
+        """Return a valid storage state file for the credential set, logging in if needed.
+
+        recipe defaults to the credential set's "login" entry.
+        """
+        if credential_name not in credentials:
+            raise KeyError(f"Unknown credential set: {credential_name}")
+        recipe = recipe or credentials[credential_name].get("login")
+        if not recipe:
+            raise ValueError(f"Credential set '{credential_name}' has no login recipe")
+        username = credentials[credential_name]["username"]
+        password = credentials[credential_name]["password"]
+
+        cached = self.get(credential_name, recipe["url"], username)
+        if cached:
+            print(f"Reusing authenticated session for '{credential_name}': {cached}")
+            return cached
+
+        print(f"Logging in as '{credential_name}' to capture session state...")
+        state = await login_and_capture_state(recipe, username, password)
+        return self.save(credential_name, recipe["url"], username, state)
+
+
+async def login_and_capture_state(recipe: Dict[str, str], username: str, password: str) -> Dict[str, Any]:
+    """Log in with a headless Playwright browser and return its storage state"""
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context()
+            page = await context.new_page()
+            await page.goto(recipe["url"])
+            await page.fill(recipe["username_selector"], username)
+            await page.fill(recipe["password_selector"], password)
+            await page.click(recipe["submit_selector"])
+            try:
+                await page.wait_for_selector(recipe["success_selector"], timeout=15000)
+            except Exception as e:
+                raise RuntimeError(f"Login as '{username}' did not succeed on {recipe['url']}") from e
+            return await context.storage_state()
+        finally:
+            await browser.close()
@@ -0,0 +1,346 @@
+# Long-running agent service with a local HTTP API and a job queue.
+#
+# Instead of paying Python imports, MCP spawn, tool discovery and LLM client creation
+# for every request (as main.py does), the service keeps a pool of warm workers. Each
+# worker owns a connected Playwright MCP browser session and pre-built agents, and
+# takes jobs from a shared queue.
+#
+# Usage:
+#   python -m src.service.agent_service --port 8765 --workers 2
+#
+#   curl -X POST localhost:8765/jobs -d '{"kind": "generate", "task_id": "3"}'
+#   curl -X POST localhost:8765/jobs -d '{"kind": "execute", "folder": "parabank_tests/features/"}'
+#   curl -X POST localhost:8765/jobs -d '{"kind": "evaluate", "job_id": "<generate or execute job_id>"}'
+#   curl localhost:8765/jobs/<job_id>
+#   curl -X DELETE localhost:8765/jobs/<job_id>
+#   curl localhost:8765/health
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from prompt.prompts import testcases_prompt, testing_prompt, evaluation_task
+from src.mcp_client.playwright_mcp import PlaywrightMCPClient
+from src.agent.testing_agent import create_test_agent_executor, run_with_cost_tracking
+from src.agent.rate_limiter import get_rate_limiter
+from src.agent.critic_agent import create_evaluation_agent_executor, run_evaluation_agent
+from utils.load_feature_files import iter_feature_files
+from utils.loop_profiler import profiled
+from utils.agent_logs import log_steps
+
+JOB_KINDS = ("generate", "execute", "evaluate")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+# Agent steps of every generate/execute job, read by the evaluate jobs
+JOB_LOG_DIR = os.getenv("AGENT_SERVICE_LOG_DIR", "job_logs")
+
+
+@dataclass
+class Job:
+    kind: str
+    params: Dict[str, Any]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    worker: Optional[int] = None
+    output: Optional[str] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    log_path: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "worker": self.worker,
+            "output": self.output,
+            "error": self.error,
+            "log_path": self.log_path,
+        }
+
+
+class AgentWorker:
+    """A warm browser session with its agents, reused across jobs"""
+
+    def __init__(self, index: int, credentials: Dict[str, Any], profile: Optional[str] = None):
+        self.index = index
+        self.credentials = credentials
+        # Isolated so several workers' browsers don't share one persistent profile
+        self.mcp_client = PlaywrightMCPClient(profile=profile, isolated=True)
+        self.test_executor = None
+        self.evaluation_executor = None
+
+    async def start(self):
+        await self.mcp_client.connect()
+        mcp_tools = await self.mcp_client.list_tools()
+        self.test_executor = create_test_agent_executor(self.mcp_client, mcp_tools)
+        self.evaluation_executor = create_evaluation_agent_executor()
+        print(f"Worker {self.index} ready with {len(mcp_tools)} MCP tools")
+
+    async def stop(self):
+        await self.mcp_client.disconnect()
+
+    async def reset_browser(self):
+        """Close the page between jobs so the next job starts from a clean tab"""
+        try:
+            await self.mcp_client.call_tool("browser_close", {})
+        except Exception:
+            pass
+
+    async def run(self, job: Job) -> str:
+        if job.kind == "evaluate":
+            prompt = job.params.get("prompt") or evaluation_task.format(log_path=job.params["log_path"])
+            result = await run_evaluation_agent(prompt, self.evaluation_executor)
+            if result is None:
+                raise RuntimeError("Evaluation agent failed")
+            return result.get("output", "")
+
+        logs: List[str] = []
+        try:
+            return await self._run_agent(job, logs)
+        finally:
+            os.makedirs(os.path.dirname(job.log_path) or ".", exist_ok=True)
+            with open(job.log_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(logs))
+
+    async def _run_agent(self, job: Job, logs: List[str]) -> str:
+        self.mcp_client.page_state.begin_conversation()
+        if job.kind == "generate":
+            prompt = testcases_prompt.format(
+                task_id=job.params["task_id"],
+                credentials=self.credentials,
+                parent_folder=job.params.get("parent_folder", "parabank_tests"),
+            )
+            result = await run_with_cost_tracking(self.test_executor, prompt)
+            log_steps(logs, result.get("intermediate_steps", []))
+            return result.get("output", "")
+
+        if job.kind == "execute":
+            folder = job.params.get("folder", f"{job.params.get('parent_folder', 'parabank_tests')}/features/")
+            outputs = []
+            for feature_path, feature in iter_feature_files(folder):
+                result = await run_with_cost_tracking(
+                    self.test_executor, testing_prompt.format(feature=feature), tool_phase="execute"
+                )
+                logs.append(f"Feature: {feature_path}")
+                log_steps(logs, result.get("intermediate_steps", []))
+                outputs.append(f"{feature_path}: {result.get('output', '')}")
+                await self.reset_browser()
+                self.mcp_client.page_state.begin_conversation()
+            return "\n".join(outputs) or f"No feature files found in {folder}"
+
+        raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+class AgentService:
+    """Job queue and scheduler dispatching jobs onto warm workers"""
+
+    def __init__(self, workers: int = 1, credentials: Optional[Dict[str, Any]] = None,
+                 profile: Optional[str] = None):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.jobs: Dict[str, Job] = {}
+        self.workers = [AgentWorker(i, credentials or {}, profile) for i in range(workers)]
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        # Warm all workers in parallel, startup cost is paid once here
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+        self._worker_tasks = [asyncio.create_task(self._worker_loop(w)) for w in self.workers]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        await asyncio.gather(*(worker.stop() for worker in self.workers), return_exceptions=True)
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(JOB_KINDS)}")
+        if kind == "generate" and not params.get("task_id"):
+            raise ValueError("generate jobs need a task_id")
+        if kind == "evaluate" and not params.get("prompt"):
+            params["log_path"] = self._evaluated_log(params)
+        job = Job(kind=kind, params=params)
+        if kind != "evaluate":
+            job.log_path = os.path.join(JOB_LOG_DIR, f"{job.id}.log")
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    def _evaluated_log(self, params: Dict[str, Any]) -> str:
+        """Log an evaluate job reads: its log_path, the log of job_id, or the last finished job's log"""
+        if params.get("log_path"):
+            return params["log_path"]
+        if params.get("job_id"):
+            job = self.jobs.get(params["job_id"])
+            if job is None or job.log_path is None:
+                raise ValueError(f"unknown generate/execute job {params['job_id']}")
+            if job.status not in FINISHED_STATES:
+                raise ValueError(f"job {job.id} has not finished yet")
+            return job.log_path
+        finished = [job for job in self.jobs.values() if job.log_path and job.status in ("succeeded", "failed")]
+        if not finished:
+            raise ValueError("evaluate jobs need a job_id or log_path, and no generate/execute job has finished yet")
+        return max(finished, key=lambda job: job.finished_at).log_path
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        if job.status == "queued":
+            # Left in the queue, the worker skips it when dequeued
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        elif job.task is not None:
+            job.cancel_requested = True
+            job.task.cancel()
+        return job
+
+    def health(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": len(self.workers),
+            "queue_depth": sum(1 for job in self.jobs.values() if job.status == "queued"),
+            "jobs": statuses,
+            "page_state": [worker.mcp_client.page_state.stats() for worker in self.workers],
+            "llm_rate_limiter": get_rate_limiter().metrics(),
+        }
+
+    async def _worker_loop(self, worker: AgentWorker):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == "cancelled":
+                    continue
+                job.status = "running"
+                job.worker = worker.index
+                job.started_at = time.time()
+                job.task = asyncio.create_task(worker.run(job))
+                try:
+                    job.output = await job.task
+                    job.status = "succeeded"
+                except asyncio.CancelledError:
+                    if not job.cancel_requested:
+                        # The service itself is shutting down
+                        raise
+                    job.status = "cancelled"
+                    await worker.reset_browser()
+                except Exception as e:
+                    job.status = "failed"
+                    job.error = f"{e}\n{traceback.format_exc()}"
+                finally:
+                    job.finished_at = time.time()
+                    job.task = None
+            finally:
+                self.queue.task_done()
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    method, path, _ = request_line.split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    length = int(headers.get("content-length", "0") or 0)
+    if length:
+        body = await reader.readexactly(length)
+    return method.upper(), path.split("?", 1)[0].rstrip("/") or "/", body
+
+
+def _handle(service: AgentService, method: str, path: str, body: bytes):
+    """Route one API request, returning (status code, JSON payload)"""
+    parts = [p for p in path.split("/") if p]
+    if method == "GET" and parts == ["health"]:
+        return 200, service.health()
+    if parts[:1] != ["jobs"]:
+        return 404, {"error": "not found"}
+    if len(parts) == 1:
+        if method == "GET":
+            return 200, {"jobs": [job.to_dict() for job in service.jobs.values()]}
+        if method == "POST":
+            try:
+                params = json.loads(body or b"{}")
+                kind = params.pop("kind", "")
+                job = service.submit(kind, params)
+            except (ValueError, AttributeError) as e:
+                return 400, {"error": str(e)}
+            return 202, job.to_dict()
+        return 405, {"error": "method not allowed"}
+    job_id = parts[1]
+    if job_id not in service.jobs:
+        return 404, {"error": f"unknown job {job_id}"}
+    if method == "GET":
+        return 200, service.jobs[job_id].to_dict()
+    if method == "DELETE":
+        return 200, service.cancel(job_id).to_dict()
+    return 405, {"error": "method not allowed"}
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 1, profile: Optional[str] = None):
+    with open("prerequsites/credentials.json", "r", encoding="utf-8") as f:
+        credentials = json.load(f)
+
+    service = AgentService(workers=workers, credentials=credentials, profile=profile)
+    print(f"Starting {workers} warm worker(s)...")
+    await service.start()
+
+    async def on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await _read_request(reader)
+            if request is None:
+                return
+            status, payload = _handle(service, *request)
+            data = json.dumps(payload, default=str).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+        except Exception as e:
+            print(f"Error handling request: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connection, host, port)
+    print(f"Agent service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the agents as a long-running service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="number of warm browser sessions")
+    parser.add_argument("--profile", help="browser launch profile, e.g. 'fast' (see src/mcp_client/launch_profiles.py)")
+    args = parser.parse_args()
+    try:
+        # With AGENT_PROFILE=1 the profile is written when the service is stopped
+        asyncio.run(profiled(serve(args.host, args.port, args.workers, args.profile), "service"))
+    except KeyboardInterrupt:
+        pass
@@ -1,6 +1,7 @@
 import os
-from typing import Optional
+from typing import List, Optional
 from langchain.tools import StructuredTool
+from utils.file_index import DEFAULT_OMIT, get_file_index
 
 def write_file(path: str, content: str) -> str:
     """Writes or creates a file in the local system."""
@@ -24,6 +25,26 @@ def get_writer_tool():
     return writer_tool
 
 
+def get_draft_writer_tool():
+    """Same interface as the writer tool, but files are only kept in the agent's steps as drafts.
+
+    Used by agents whose files are merged and written by the caller (see src/agent/generation_agent.py).
+    """
+    def write_create_file(path: str, content: str) -> str:
+        return f"✅ Draft of {path} recorded, it will be written when all drafts are merged"
+
+    draft_writer_tool = StructuredTool.from_function(
+        func=write_create_file,
+        name="write_create_file",
+        description=(
+            "Writes or creates a file in the local system. "
+            "Args: path (str): file path to save to; "
+            "content (str): content to write to the file."
+        ),
+    )
+    return draft_writer_tool
+
+
 def read_file(path: str) -> str:
     """Reads a file from the local system."""
     try:
@@ -46,28 +67,37 @@ def get_reader_tool():
     )
     return reader_tool
 
-def list_files_in_root(folders_to_omit: list) -> str:
+def list_files_in_root(folders_to_omit: list, pattern: Optional[str] = None,
+                       extensions: Optional[List[str]] = None, offset: int = 0,
+                       limit: Optional[int] = 200) -> str:
     """Lists all files in the root directory and with all the files inside the subdirectories with their paths.
-    Should not include the files in given folders_to_omit.
+    Should not include the files in given folders_to_omit or ignored by .gitignore.
     All the paths should have '/' for directory separator."""
-    file_list = []
-    for root, dirs, files in os.walk("."):
-        for file in files:
-            if not any(folder in root for folder in folders_to_omit):
-                file_list.append(os.path.relpath(os.path.join(root, file), ".").replace("\\", "/"))
-    return "\n".join(file_list)
+    index = get_file_index(".", folders_to_omit)
+    files, total = index.list(pattern=pattern, extensions=extensions, offset=offset, limit=limit)
+    result = "\n".join(files)
+    if offset + len(files) < total:
+        result += f"\n... showing {offset + 1}-{offset + len(files)} of {total} files, use offset={offset + len(files)} for more"
+    return result
 
 def get_file_lister_tool(folders_to_omit: Optional[list] = None):
     if folders_to_omit is None:
-        folders_to_omit = ["node_modules", ".git", "__pycache__", "venv", ".venv", "env", ".env","dump"]
+        folders_to_omit = DEFAULT_OMIT
+
+    def list_files(pattern: Optional[str] = None, extensions: Optional[List[str]] = None,
+                   offset: int = 0, limit: Optional[int] = 200) -> str:
+        return list_files_in_root(folders_to_omit, pattern, extensions, offset, limit)
+
     lister_tool = StructuredTool.from_function(
-        func=lambda: list_files_in_root(folders_to_omit),
+        func=list_files,
         name="list_files",
         description=(
             "Lists all files in the root directory and with all the files inside the subdirectories with their paths. "
-            "Should not include the files in given folders_to_omit. "
+            "Folders like node_modules and anything ignored by .gitignore are skipped. "
             "All the paths should have '/' for directory separator. "
-            "Args: None"
+            "Args: pattern (str, optional): glob such as 'features/*.feature' or '*.js'; "
+            "extensions (list, optional): e.g. ['.feature', '.js']; "
+            "offset (int): number of files to skip; limit (int): maximum number of files to return."
         ),
     )
-    return lister_tool
\ No newline at end of file
+    return lister_tool
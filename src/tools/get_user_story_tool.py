@@ -64,10 +64,39 @@ class AzureDevOpsConnector:
         
         # Get full work item details
         work_item_ids = [item.id for item in query_results]
-        work_items = self.wit_client.get_work_items(
-            ids=work_item_ids,
-            expand='All'
-        )
+        return self.get_work_items_by_ids(work_item_ids)
+
+    def query_work_item_ids(self, wiql_query):
+        """
+        Run a WIQL query and return the matching work item IDs
+        
+        Args:
+            wiql_query: WIQL query text selecting [System.Id]
+            
+        Returns:
+            List of work item IDs
+        """
+        query_results = self.wit_client.query_by_wiql(Wiql(query=wiql_query)).work_items
+        return [item.id for item in query_results or []]
+
+    def get_work_items_by_ids(self, work_item_ids, batch_size=200):
+        """
+        Retrieve the full details of the given work items in as few calls as possible
+        
+        Args:
+            work_item_ids: IDs of the work items to retrieve
+            batch_size: IDs per request (Azure DevOps accepts at most 200)
+            
+        Returns:
+            List of work item dictionaries, in the order of work_item_ids
+        """
+        work_item_ids = list(dict.fromkeys(int(i) for i in work_item_ids))
+        work_items = []
+        for start in range(0, len(work_item_ids), batch_size):
+            work_items.extend(self.wit_client.get_work_items(
+                ids=work_item_ids[start:start + batch_size],
+                expand='All'
+            ))
         
         # Format work items
         work_items_list = []
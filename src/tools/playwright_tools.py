@@ -1,5 +1,5 @@
 from src.mcp_client.playwright_mcp import PlaywrightMCPClient
-import asyncio
+from src.mcp_client.loop_bridge import run_sync
 from pydantic import BaseModel, Field
 from langchain.tools import StructuredTool
 from typing import List, Dict, Any
@@ -18,17 +18,9 @@ class AsyncToolWrapper:
         return await self.mcp_client.call_tool(self.tool_name, kwargs)
 
     def run(self, **kwargs) -> str:
-        """Sync run method - NOT RECOMMENDED, use async"""
+        """Sync run method - submits the call to the event loop owning the MCP session"""
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # Create a new event loop in a thread
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self.arun(**kwargs))
-                    return future.result()
-            else:
-                return loop.run_until_complete(self.arun(**kwargs))
+            return run_sync(self.arun(**kwargs), loop=getattr(self.mcp_client, "loop", None))
         except Exception as e:
             return f"Error executing tool: {str(e)}"
     
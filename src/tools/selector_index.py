@@ -0,0 +1,293 @@
+# Learned selector index per site.
+#
+# Every Playwright MCP action answers with the code it ran ("### Ran Playwright code"),
+# e.g. `await page.locator('input[name="username"]').fill('prajus');` or
+# `await page.getByRole('button', { name: 'Log In' }).click();`. We collect those locators
+# per page (URL pattern) and element (role/name) from past runs, count how often they
+# worked or failed, and let the agents look them up instead of rediscovering the same
+# selectors through snapshot round trips on every run.
+#
+# Bootstrap the index from an existing log:
+#   python -m src.tools.selector_index agent_thoughts.log
+import os
+import re
+import ast
+import sys
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from langchain.tools import StructuredTool
+
+SELECTOR_INDEX_DIR = os.getenv("SELECTOR_INDEX_DIR", ".selector_index")
+# Entries not confirmed for this long are reported as unverified
+SELECTOR_STALE_AFTER = float(os.getenv("SELECTOR_STALE_DAYS", "14")) * 86400
+
+_CODE_RE = re.compile(r"### Ran Playwright code\s*```js\n(.*?)```", re.DOTALL)
+_URL_RE = re.compile(r"^- Page URL: (\S+)", re.MULTILINE)
+_LOCATOR_RE = re.compile(
+    r"""(?:page|frame)\.(locator|getByRole|getByText|getByLabel|getByPlaceholder|getByTestId|getByAltText|getByTitle)"""
+    r"""\(\s*(['"])((?:\\.|(?!\2).)*)\2\s*(?:,\s*\{\s*name:\s*(['"])((?:\\.|(?!\4).)*)\4[^}]*\})?\s*\)"""
+)
+_ACTION_RE = re.compile(r"\)\.(click|fill|type|check|uncheck|selectOption|hover|press|dblclick)\(")
+_ROLE_LINE_RE = r'^\s*- {role} "{name}"'
+
+_METHOD_ROLES = {
+    "getByText": "text",
+    "getByLabel": "label",
+    "getByPlaceholder": "placeholder",
+    "getByTestId": "testid",
+    "getByAltText": "img",
+    "getByTitle": "title",
+}
+
+
+def url_pattern(url: str) -> str:
+    """Key a page by host and path, without session ids, query or fragment"""
+    parts = urlsplit(url)
+    path = re.sub(r";jsessionid=[^/]*", "", parts.path, flags=re.IGNORECASE)
+    return f"{parts.netloc.lower()}{path.rstrip('/') or '/'}"
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def parse_locators(code: str) -> List[Dict[str, str]]:
+    """Extract the locators used in a block of Playwright code"""
+    locators = []
+    for match in _LOCATOR_RE.finditer(code):
+        method, arg, name = match.group(1), _unescape(match.group(3)), match.group(5)
+        if method == "locator":
+            locator = {"kind": "css", "role": "", "name": "", "selector": arg}
+        elif method == "getByRole":
+            locator = {"kind": "role", "role": arg, "name": _unescape(name or ""), "selector": match.group(0)}
+        else:
+            locator = {"kind": "role", "role": _METHOD_ROLES[method], "name": arg, "selector": match.group(0)}
+        rest = code[match.end() - 1:match.end() + 30]
+        action = _ACTION_RE.match(rest)
+        locator["action"] = action.group(1) if action else ""
+        locators.append(locator)
+    return locators
+
+
+def _observation_text(observation: Any) -> str:
+    if not isinstance(observation, str):
+        return str(observation)
+    try:
+        items = json.loads(observation)
+        return "\n".join(item.get("text", "") for item in items if isinstance(item, dict))
+    except (ValueError, TypeError, AttributeError):
+        return observation
+
+
+def _is_error(text: str) -> bool:
+    head = text.split("### Page state", 1)[0]
+    return bool(re.search(r"(^|\n)(### Result\n)?Error\b|TimeoutError|not found|strict mode violation", head))
+
+
+class SelectorIndex:
+    """Persistent per-site knowledge base of the selectors seen in past runs"""
+
+    def __init__(self, directory: str = SELECTOR_INDEX_DIR):
+        self.directory = directory
+        self._sites: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _site_path(self, host: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^0-9a-zA-Z.-]+", "_", host) + ".json")
+
+    def _site(self, host: str) -> Dict[str, Dict[str, Any]]:
+        if host not in self._sites:
+            try:
+                with open(self._site_path(host), "r", encoding="utf-8") as f:
+                    self._sites[host] = json.load(f)
+            except (OSError, ValueError):
+                self._sites[host] = {}
+        return self._sites[host]
+
+    def _save(self, host: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._site_path(host)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._sites[host], f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def record(self, page_url: str, locator: Dict[str, str], ok: bool, element: str = "", save: bool = True) -> str:
+        """Count one use of a locator on a page; returns the site's host.
+
+        With save=False the site file is not written, call save() once after a batch of records.
+        """
+        pattern = url_pattern(page_url)
+        host = pattern.split("/", 1)[0]
+        key = f"{pattern}|{locator['selector']}"
+        with self._lock:
+            site = self._site(host)
+            entry = site.setdefault(key, {
+                "url": pattern,
+                "kind": locator["kind"],
+                "role": locator["role"],
+                "name": locator["name"],
+                "selector": locator["selector"],
+                "element": "",
+                "actions": [],
+                "successes": 0,
+                "failures": 0,
+                "last_seen": 0,
+                "last_verified": 0,
+                "last_failed": 0,
+            })
+            if element:
+                entry["element"] = element
+            if locator.get("action") and locator["action"] not in entry["actions"]:
+                entry["actions"].append(locator["action"])
+            entry["last_seen"] = time.time()
+            if ok:
+                entry["successes"] += 1
+                entry["last_verified"] = entry["last_seen"]
+            else:
+                entry["failures"] += 1
+                entry["last_failed"] = entry["last_seen"]
+            if save:
+                self._save(host)
+        return host
+
+    def save(self, hosts):
+        """Write the files of the given sites"""
+        with self._lock:
+            for host in hosts:
+                self._save(host)
+
+    def learn_from_steps(self, steps: List[Tuple[Any, Any]]) -> int:
+        """Learn from a run's (action, observation) steps; returns the number of locators recorded"""
+        current_url = None
+        learned = 0
+        hosts = set()
+        for action, observation in steps:
+            tool = getattr(action, "tool", "")
+            tool_input = getattr(action, "tool_input", {})
+            tool_input = tool_input if isinstance(tool_input, dict) else {}
+            text = _observation_text(observation)
+            if tool.endswith("browser_navigate") and tool_input.get("url"):
+                current_url = tool_input["url"]
+            code = _CODE_RE.search(text)
+            # The action ran on the page we were on before it, not the one it may have led to
+            if code and current_url:
+                ok = not _is_error(text)
+                for locator in parse_locators(code.group(1)):
+                    hosts.add(self.record(current_url, locator, ok, tool_input.get("element", ""), save=False))
+                    learned += 1
+            url = _URL_RE.search(text)
+            if url:
+                current_url = url.group(1)
+        # One write per site instead of one per locator
+        self.save(hosts)
+        return learned
+
+    def lookup(self, url: str, snapshot: Optional[str] = None, limit: int = 30) -> List[Dict[str, Any]]:
+        """Known selectors for a page (or the whole site if the page is unknown), most reliable first.
+
+        If the current page snapshot is given, role based locators are checked against it; CSS
+        locators can't be found in the snapshot and are left out once their last use failed.
+        """
+        pattern = url_pattern(url)
+        host = pattern.split("/", 1)[0]
+        with self._lock:
+            entries = [
+                dict(e) for e in self._site(host).values()
+                if e["successes"] > e["failures"]
+                and not (e["kind"] == "css" and e.get("last_failed", 0) > e["last_verified"])
+            ]
+        page_entries = [e for e in entries if e["url"] == pattern]
+        entries = page_entries or entries
+        now = time.time()
+        for entry in entries:
+            if snapshot is not None and entry["kind"] == "role" and entry["url"] == pattern and entry["name"]:
+                line = _ROLE_LINE_RE.format(role=re.escape(entry["role"]), name=re.escape(entry["name"]))
+                entry["status"] = "present on page" if re.search(line, snapshot, re.MULTILINE) else "NOT on current page"
+            elif now - entry["last_verified"] > SELECTOR_STALE_AFTER:
+                entry["status"] = "unverified (stale)"
+            elif snapshot is not None and entry["kind"] == "css" and entry["url"] == pattern:
+                entry["status"] = "unverified (CSS, not checked against the page)"
+            else:
+                entry["status"] = "verified"
+        rank = {"verified": 0, "present on page": 0, "NOT on current page": 2}
+        entries.sort(key=lambda e: (rank.get(e["status"], 1), -(e["successes"] - e["failures"])))
+        return entries[:limit]
+
+
+_selector_index: Optional[SelectorIndex] = None
+
+
+def get_selector_index() -> SelectorIndex:
+    """Return the shared SelectorIndex"""
+    global _selector_index
+    if _selector_index is None:
+        _selector_index = SelectorIndex()
+    return _selector_index
+
+
+def format_selectors(entries: List[Dict[str, Any]]) -> str:
+    lines = []
+    for e in entries:
+        element = e["element"] or (f'{e["role"]} "{e["name"]}"' if e["name"] else "")
+        lines.append(
+            f"- [{e['url']}] {element}: {e['selector']} "
+            f"(used for {', '.join(e['actions']) or 'n/a'}; {e['successes']} ok / {e['failures']} failed; {e['status']})"
+        )
+    return "\n".join(lines)
+
+
+def get_selector_lookup_tool(mcp_client=None):
+    """Tool letting the agent query the selector index before exploring a page"""
+    index = get_selector_index()
+
+    def lookup_known_selectors(url: str) -> str:
+        """Look up selectors learned from previous runs for a page URL"""
+        snapshot = None
+        page_state = getattr(mcp_client, "page_state", None)
+        if page_state is not None and page_state.tab.url and url_pattern(page_state.tab.url) == url_pattern(url):
+            snapshot = page_state.tab.snapshot
+        entries = index.lookup(url, snapshot)
+        if not entries:
+            return f"No known selectors for {url_pattern(url)}, inspect the page."
+        return f"Known selectors for {url_pattern(url)}:\n{format_selectors(entries)}"
+
+    return StructuredTool.from_function(
+        func=lookup_known_selectors,
+        name="lookup_known_selectors",
+        description=(
+            "Returns the selectors that worked on this page/site in previous runs, with how reliable they are. "
+            "Call it before inspecting a page and reuse the verified selectors instead of exploring again; "
+            "check unverified ones against the page before relying on them. "
+            "Args: url (str): the page URL."
+        ),
+    )
+
+
+def learn_from_log(path: str) -> int:
+    """Learn selectors from an agent_thoughts.log file written by main.py"""
+    from types import SimpleNamespace
+
+    steps = []
+    tool, tool_input = None, {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Action: "):
+                tool = line[len("Action: "):].strip()
+            elif line.startswith("Action Input: "):
+                try:
+                    tool_input = ast.literal_eval(line[len("Action Input: "):].strip())
+                except (ValueError, SyntaxError):
+                    tool_input = {}
+            elif line.startswith("Observation: ") and tool:
+                steps.append((SimpleNamespace(tool=tool, tool_input=tool_input), line[len("Observation: "):].strip()))
+                tool, tool_input = None, {}
+    return get_selector_index().learn_from_steps(steps)
+
+
+if __name__ == "__main__":
+    for log_path in sys.argv[1:] or ["agent_thoughts.log"]:
+        print(f"{log_path}: learned {learn_from_log(log_path)} selector uses")
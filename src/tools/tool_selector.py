@@ -0,0 +1,157 @@
+# Phase-aware tool subsetting for the OpenAI functions agent.
+#
+# create_openai_functions_agent binds every tool schema to every LLM call. Most of them
+# are irrelevant at any given point of a run, so we only expose the tools of the current
+# phase:
+#   lookup  - fetching the story from Azure DevOps, before any browsing
+#   execute - a core subset of the browser tools
+#   emit    - the file writer, once the agent is ready to write artifacts
+# The agent can always widen its set with the `request_tools` tool. Tools are kept in a
+# fixed order so the function list (the static prefix of every request) stays identical
+# within a phase and provider-side prompt caching can kick in.
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain.tools import StructuredTool
+from langchain.agents.format_scratchpad.openai_functions import format_to_openai_function_messages
+from langchain.agents.output_parsers.openai_functions import OpenAIFunctionsAgentOutputParser
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.utils.function_calling import convert_to_openai_function
+
+PHASES = ("lookup", "execute", "emit")
+
+ADO_TOOLS = {"GetAzureDevOpsWorkItems"}
+FILE_TOOLS = {"write_create_file", "read_file", "list_files"}
+CORE_BROWSER_TOOLS = {
+    "browser_navigate",
+    "browser_navigate_back",
+    "browser_click",
+    "browser_type",
+    "browser_fill_form",
+    "browser_select_option",
+    "browser_press_key",
+    "browser_hover",
+    "browser_wait_for",
+    "browser_evaluate",
+    "browser_snapshot",
+    "browser_handle_dialog",
+}
+# Cheap knowledge lookups that are useful in every phase
+ALWAYS_TOOLS = {"lookup_known_selectors"}
+REQUEST_TOOLS_NAME = "request_tools"
+CATEGORIES = ("browser", "files", "azure_devops")
+
+
+def _base_name(tool_name: str) -> str:
+    # The MCP registry aggregator namespaces tools as "<server>__<tool>"
+    return tool_name.rsplit("__", 1)[-1]
+
+
+def get_request_tools_tool():
+    def request_tools(category: str) -> str:
+        """Enable more tools for the rest of the run"""
+        if category not in CATEGORIES:
+            return f"Unknown category '{category}'. Use one of: {', '.join(CATEGORIES)}"
+        return f"Tools of category '{category}' are now available."
+
+    return StructuredTool.from_function(
+        func=request_tools,
+        name=REQUEST_TOOLS_NAME,
+        description=(
+            "Only a subset of the tools is available at each step. Call this to enable more. "
+            "Args: category (str): 'browser' for all browser tools (tabs, drag, upload, screenshots...), "
+            "'files' for the file writer/reader, 'azure_devops' for work item lookup."
+        ),
+    )
+
+
+class ToolSelector:
+    """Picks the tools to expose to the LLM from the run's intermediate steps"""
+
+    def __init__(self, tools: Sequence, max_iterations: int = 20, emit_reserve: int = 4,
+                 default_phase: str = "lookup"):
+        self.request_tool = get_request_tools_tool()
+        self.tools = [self.request_tool] + list(tools)
+        self.max_iterations = max_iterations
+        self.emit_reserve = emit_reserve
+        self.default_phase = default_phase
+        self.categories: Dict[str, str] = {}
+        for tool in tools:
+            name = _base_name(tool.name)
+            if name in ALWAYS_TOOLS:
+                self.categories[tool.name] = "always"
+            elif name in ADO_TOOLS:
+                self.categories[tool.name] = "azure_devops"
+            elif name in FILE_TOOLS:
+                self.categories[tool.name] = "files"
+            elif name in CORE_BROWSER_TOOLS:
+                self.categories[tool.name] = "core_browser"
+            else:
+                self.categories[tool.name] = "browser"
+
+    def phase(self, intermediate_steps: List[Tuple[Any, Any]], start_phase: Optional[str] = None) -> str:
+        start_phase = start_phase or self.default_phase
+        used = {action.tool for action, _ in intermediate_steps}
+        requested = self.requested_categories(intermediate_steps)
+        has_ado = "azure_devops" in self.categories.values()
+        if start_phase == "lookup" and has_ado and not any(self.categories.get(t) == "azure_devops" for t in used):
+            return "lookup"
+        # Keep room at the end of the iteration budget to write the artifacts
+        if (start_phase == "emit" or "files" in requested
+                or any(self.categories.get(t) == "files" for t in used)
+                or len(intermediate_steps) >= self.max_iterations - self.emit_reserve):
+            return "emit"
+        return "execute"
+
+    def requested_categories(self, intermediate_steps: List[Tuple[Any, Any]]) -> set:
+        requested = set()
+        for action, _ in intermediate_steps:
+            if action.tool == REQUEST_TOOLS_NAME:
+                tool_input = action.tool_input
+                category = tool_input.get("category") if isinstance(tool_input, dict) else tool_input
+                requested.add(str(category).strip())
+        return requested
+
+    def select(self, intermediate_steps: List[Tuple[Any, Any]], start_phase: Optional[str] = None) -> List:
+        """Return the tools to bind for the next LLM call, in a stable order"""
+        phase = self.phase(intermediate_steps, start_phase)
+        enabled = self.requested_categories(intermediate_steps) | {"always"}
+        if phase == "lookup":
+            enabled.add("azure_devops")
+        else:
+            enabled.add("core_browser")
+        if phase == "emit":
+            enabled.add("files")
+        if "browser" in enabled:
+            enabled.add("core_browser")
+        return [self.request_tool] + [t for t in self.tools[1:] if self.categories[t.name] in enabled]
+
+
+def create_phased_functions_agent(llm, tools: Sequence, prompt, selector: Optional[ToolSelector] = None,
+                                  max_iterations: int = 20):
+    """Same as create_openai_functions_agent, but binds only the tools selected for the current phase.
+
+    The start phase can be given per run with the `tool_phase` input key
+    (e.g. agent_executor.ainvoke({"input": ..., "tool_phase": "execute"})), and steps of an
+    interrupted run can be replayed into the scratchpad with the `restored_steps` input key.
+
+    Returns:
+        (agent, all tools including `request_tools`) - pass all tools to the AgentExecutor
+    """
+    selector = selector or ToolSelector(tools, max_iterations=max_iterations)
+    functions = {tool.name: convert_to_openai_function(tool) for tool in selector.tools}
+
+    def all_steps(inputs: Dict[str, Any]):
+        return list(inputs.get("restored_steps") or []) + list(inputs["intermediate_steps"])
+
+    def bind_selected_tools(inputs: Dict[str, Any]):
+        selected = selector.select(all_steps(inputs), inputs.get("tool_phase"))
+        return prompt | llm.bind(functions=[functions[tool.name] for tool in selected])
+
+    agent = (
+        RunnablePassthrough.assign(
+            agent_scratchpad=lambda x: format_to_openai_function_messages(all_steps(x))
+        )
+        | RunnableLambda(bind_selected_tools)
+        | OpenAIFunctionsAgentOutputParser()
+    )
+    return agent, selector.tools
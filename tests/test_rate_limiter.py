@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
+from langchain_openai import ChatOpenAI
+
+from src.agent import rate_limiter
+from src.agent.rate_limiter import RateLimiter, create_llm
+
+
+def _rate_limit_error():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1_000_000)
+    monkeypatch.setattr(rate_limiter, "_rate_limiter", limiter)
+    monkeypatch.setattr(rate_limiter, "_retry_delay", lambda error, attempt: 0.0)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return limiter
+
+
+def _fake_openai_stream(monkeypatch, replies):
+    """Replace the OpenAI request of ChatOpenAI._astream: each call takes the next reply"""
+    calls = []
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = replies[len(calls)]
+        calls.append(messages)
+        for chunk in reply:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield ChatGenerationChunk(message=chunk)
+
+    monkeypatch.setattr(ChatOpenAI, "_astream", _astream)
+    return calls
+
+
+@tool
+def lookup_page(url: str) -> str:
+    """Return the title of a page"""
+    return f"Title of {url}"
+
+
+def _agent_executor(llm):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You test web pages."),
+        ("user", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+    agent = create_tool_calling_agent(llm, [lookup_page], prompt)
+    return AgentExecutor(agent=agent, tools=[lookup_page], return_intermediate_steps=True)
+
+
+def test_agent_executor_streams_through_the_limiter(limiter, monkeypatch):
+    tool_call = AIMessageChunk(content="", tool_call_chunks=[
+        {"name": "lookup_page", "args": '{"url": "https://example.com"}', "id": "call_1", "index": 0}
+    ])
+    calls = _fake_openai_stream(monkeypatch, [
+        [_rate_limit_error()],
+        [tool_call],
+        [AIMessageChunk(content="The page is "), AIMessageChunk(content="up.")],
+    ])
+    executor = _agent_executor(create_llm())
+
+    result = asyncio.run(executor.ainvoke({"input": "Check https://example.com"}))
+
+    assert result["output"] == "The page is up."
+    assert result["intermediate_steps"][0][1] == "Title of https://example.com"
+    assert len(calls) == 3
+    metrics = limiter.metrics()
+    # The 429 was retried by the limiter (max_retries=0 on the client), every attempt acquired
+    assert metrics["requests"] == 3
+    assert metrics["retries"] == 1
+    assert metrics["rate_limited"] == 1
+    assert metrics["queue_depth"] == 0
+
+
+def test_stream_is_not_retried_after_the_first_chunk(limiter, monkeypatch):
+    calls = _fake_openai_stream(monkeypatch, [
+        [AIMessageChunk(content="Partial "), _rate_limit_error()],
+        [AIMessageChunk(content="never sent")],
+    ])
+    executor = _agent_executor(create_llm())
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(executor.ainvoke({"input": "Check https://example.com"}))
+
+    assert len(calls) == 1
+    assert limiter.metrics()["retries"] == 0
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from src.tools import selector_index
+from src.tools.selector_index import SelectorIndex
+
+PAGE = "https://parabank.parasoft.com/parabank/index.htm"
+USERNAME_CSS = {"kind": "css", "role": "", "name": "", "selector": 'input[name="username"]', "action": "fill"}
+LOGIN_BUTTON = {
+    "kind": "role", "role": "button", "name": "Log In",
+    "selector": "page.getByRole('button', { name: 'Log In' })", "action": "click",
+}
+SNAPSHOT = '- generic [ref=e1]:\n  - textbox [ref=e2]\n  - button "Log In" [ref=e3]\n'
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SelectorIndex(directory=str(tmp_path))
+
+
+def _statuses(entries):
+    return {entry["selector"]: entry["status"] for entry in entries}
+
+
+def test_css_entry_that_failed_after_its_last_success_is_left_out(index, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(selector_index.time, "time", lambda: now)
+    for _ in range(3):
+        index.record(PAGE, USERNAME_CSS, ok=True)
+    index.record(PAGE, LOGIN_BUTTON, ok=True)
+    # The page changed: the CSS selector stops matching while it still has more successes than failures
+    monkeypatch.setattr(selector_index.time, "time", lambda: now + 60)
+    index.record(PAGE, USERNAME_CSS, ok=False)
+
+    statuses = _statuses(index.lookup(PAGE))
+    assert USERNAME_CSS["selector"] not in statuses
+    assert statuses[LOGIN_BUTTON["selector"]] == "verified"
+
+    # Working again later, it comes back
+    monkeypatch.setattr(selector_index.time, "time", lambda: now + 120)
+    index.record(PAGE, USERNAME_CSS, ok=True)
+    assert USERNAME_CSS["selector"] in _statuses(index.lookup(PAGE))
+
+
+def test_css_entries_are_not_presented_as_checked_against_the_snapshot(index):
+    index.record(PAGE, USERNAME_CSS, ok=True)
+    index.record(PAGE, LOGIN_BUTTON, ok=True)
+
+    entries = index.lookup(PAGE, snapshot=SNAPSHOT)
+
+    assert _statuses(entries) == {
+        LOGIN_BUTTON["selector"]: "present on page",
+        USERNAME_CSS["selector"]: "unverified (CSS, not checked against the page)",
+    }
+    assert entries[0]["selector"] == LOGIN_BUTTON["selector"]
+
+
+def test_stale_entries_are_reported_unverified(index, monkeypatch):
+    index.record(PAGE, USERNAME_CSS, ok=True)
+    later = time.time() + selector_index.SELECTOR_STALE_AFTER + 1
+    monkeypatch.setattr(selector_index.time, "time", lambda: later)
+
+    assert _statuses(index.lookup(PAGE)) == {USERNAME_CSS["selector"]: "unverified (stale)"}
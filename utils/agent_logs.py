@@ -0,0 +1,12 @@
+# Agent step logs in the agent_thoughts.log format read by the critic agent and the selector index
+from typing import Any, Iterable, List, Tuple
+
+
+def log_steps(logs: List[str], steps: Iterable[Tuple[Any, Any]]):
+    """Append the Thought / Action / Action Input / Observation lines of agent steps to logs"""
+    for action, observation in steps:
+        logs.append(f"Thought: {action.log.split('Action:')[0].strip()}") # Extract thought from the log
+        logs.append(f"Action: {action.tool}")
+        logs.append(f"Action Input: {action.tool_input}")
+        logs.append(f"Observation: {observation}")
+        logs.append("-" * 20)
@@ -0,0 +1,244 @@
+# Cached, .gitignore-aware index of the workspace files used by the file lister tool
+import os
+import re
+import time
+import fnmatch
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_OMIT = ["node_modules", ".git", "__pycache__", "venv", ".venv", "env", ".env", "dump"]
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """Translate a single .gitignore glob into a regex matched against a '/'-separated relative path"""
+    i, n, out = 0, len(pattern), []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 3] == "**/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i:i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class GitIgnore:
+    """Rules from one .gitignore file, relative to the directory that contains it"""
+
+    def __init__(self, base: str, lines: Iterable[str]):
+        self.base = base
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # A slash anywhere but the end anchors the pattern to the .gitignore directory
+            if "/" in line:
+                regex = "^" + _translate_gitignore(line.lstrip("/")) + "$"
+            else:
+                regex = "^(?:.*/)?" + _translate_gitignore(line) + "$"
+            self.rules.append((re.compile(regex), negate, dir_only))
+
+    @classmethod
+    def from_file(cls, base: str, path: str) -> "GitIgnore":
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                return cls(base, f.readlines())
+        except OSError:
+            return cls(base, [])
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """Return True if ignored, False if re-included, None if no rule applies"""
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+class FileIndex:
+    """Index of the files under `root`.
+
+    Directories listed in `folders_to_omit` or ignored by a .gitignore are pruned
+    during the walk, so they are never descended into. Directory listings are cached
+    and only re-read when the directory's mtime (or a .gitignore) changes.
+    """
+
+    def __init__(self, root: str = ".", folders_to_omit: Optional[list] = None,
+                 use_gitignore: bool = True, revalidate_after: float = 1.0):
+        self.root = os.path.abspath(root)
+        self.folders_to_omit = set(DEFAULT_OMIT if folders_to_omit is None else folders_to_omit)
+        self.use_gitignore = use_gitignore
+        self.revalidate_after = revalidate_after
+        # rel dir -> (mtime_ns, files, subdirs)
+        self._dirs: Dict[str, Tuple[int, List[str], List[str]]] = {}
+        # rel path of .gitignore -> mtime_ns
+        self._ignore_mtimes: Dict[str, int] = {}
+        self._files: List[str] = []
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _abs(self, rel: str) -> str:
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _scan_dir(self, rel: str) -> Tuple[List[str], List[str]]:
+        files, subdirs = [], []
+        try:
+            with os.scandir(self._abs(rel)) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        files.sort()
+        subdirs.sort()
+        return files, subdirs
+
+    def _is_ignored(self, rel_path: str, is_dir: bool, ignores: List[GitIgnore]) -> bool:
+        ignored = False
+        for ignore in ignores:
+            result = ignore.match(rel_path, is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+    def _gitignore_changed(self) -> bool:
+        for rel, mtime in self._ignore_mtimes.items():
+            try:
+                if os.stat(self._abs(rel)).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def refresh(self, force: bool = False) -> List[str]:
+        """Re-walk the tree, reusing cached listings for directories whose mtime is unchanged"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at and now - self._checked_at < self.revalidate_after:
+                return self._files
+            if force or self._gitignore_changed():
+                self._dirs.clear()
+
+            dirs: Dict[str, Tuple[int, List[str], List[str]]] = {}
+            ignore_mtimes: Dict[str, int] = {}
+            files: List[str] = []
+            stack: List[Tuple[str, List[GitIgnore]]] = [("", [])]
+            while stack:
+                rel, ignores = stack.pop()
+                try:
+                    mtime = os.stat(self._abs(rel)).st_mtime_ns
+                except OSError:
+                    continue
+                cached = self._dirs.get(rel)
+                if cached and cached[0] == mtime:
+                    dir_files, subdirs = cached[1], cached[2]
+                else:
+                    dir_files, subdirs = self._scan_dir(rel)
+                dirs[rel] = (mtime, dir_files, subdirs)
+
+                if self.use_gitignore and ".gitignore" in dir_files:
+                    ignore_rel = f"{rel}/.gitignore" if rel else ".gitignore"
+                    try:
+                        ignore_mtimes[ignore_rel] = os.stat(self._abs(ignore_rel)).st_mtime_ns
+                    except OSError:
+                        pass
+                    ignores = ignores + [GitIgnore.from_file(rel, self._abs(ignore_rel))]
+
+                for name in dir_files:
+                    path = f"{rel}/{name}" if rel else name
+                    if not self._is_ignored(path, False, ignores):
+                        files.append(path)
+                # Push in reverse so subdirectories are visited in sorted order
+                for name in reversed(subdirs):
+                    if name in self.folders_to_omit:
+                        continue
+                    path = f"{rel}/{name}" if rel else name
+                    if self._is_ignored(path, True, ignores):
+                        continue
+                    stack.append((path, ignores))
+
+            self._dirs = dirs
+            self._ignore_mtimes = ignore_mtimes
+            self._files = files
+            self._checked_at = time.monotonic()
+            return files
+
+    def list(self, pattern: Optional[str] = None, extensions: Optional[Iterable[str]] = None,
+             offset: int = 0, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """Return one page of matching paths and the total number of matches.
+
+        Args:
+            pattern: glob matched against the relative path (or the file name if it has no '/')
+            extensions: file extensions to keep, e.g. ['.feature', '.js']
+            offset: number of matches to skip
+            limit: maximum number of paths to return (None for all)
+        """
+        files = self.refresh()
+        if extensions:
+            exts = tuple(e if e.startswith(".") else f".{e}" for e in extensions)
+            files = [f for f in files if f.endswith(exts)]
+        if pattern:
+            if "/" in pattern:
+                files = [f for f in files if fnmatch.fnmatchcase(f, pattern)]
+            else:
+                files = [f for f in files if fnmatch.fnmatchcase(f.rsplit("/", 1)[-1], pattern)]
+        total = len(files)
+        offset = max(offset, 0)
+        end = None if limit is None else offset + max(limit, 0)
+        return files[offset:end], total
+
+
+_indexes: Dict[Tuple[str, Tuple[str, ...], bool], FileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_file_index(root: str = ".", folders_to_omit: Optional[list] = None,
+                   use_gitignore: bool = True) -> FileIndex:
+    """Return the shared FileIndex for the given root and omit list"""
+    omit = tuple(sorted(DEFAULT_OMIT if folders_to_omit is None else folders_to_omit))
+    key = (os.path.abspath(root), omit, use_gitignore)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = FileIndex(root, list(omit), use_gitignore)
+            _indexes[key] = index
+        return index
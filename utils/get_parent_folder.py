@@ -1,6 +1,9 @@
 # Derive a short slug for the project parent folder from the first URL in the story, or default to 'project
 import re
 
+URL_PATTERN = r'https?://([^/\s\)\"<>\']+)[^\s\)\"<>\']*'
+
+
 def get_parent_folder(high_level_story):
     """Derive and return a short slug for the project parent folder from the first URL in the story, or default to 'project'"""
     m = re.search(r'https?://([^/\s\)\"]+)', high_level_story)
@@ -12,4 +15,15 @@ def get_parent_folder(high_level_story):
         slug = 'project'
 
     parent_folder = f"autogen/{slug}"
-    return parent_folder
\ No newline at end of file
+    return parent_folder
+
+
+def get_site_urls(high_level_story):
+    """Return all URLs found in the story, in order of appearance and without duplicates"""
+    return list(dict.fromkeys(m.group(0) for m in re.finditer(URL_PATTERN, high_level_story)))
+
+
+def get_site_key(high_level_story):
+    """Return the host of the first URL in the story (used to group stories by target site), or None"""
+    m = re.search(URL_PATTERN, high_level_story)
+    return m.group(1).lower() if m else None
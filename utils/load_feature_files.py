@@ -1,12 +1,204 @@
 import os
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+SCENARIO_KEYWORDS = ("Scenario Outline:", "Scenario Template:", "Scenario:", "Example:")
+EXAMPLES_KEYWORDS = ("Examples:", "Scenarios:")
+
 
 def load_feature_files(folder_path):
     """Load and return the content of all .feature files in the specified folder"""
-    feature_files = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
+    return [content for _, content in iter_feature_files(folder_path)]
+
+
+def iter_feature_paths(folder_path) -> Iterator[str]:
+    """Lazily yield the paths of all .feature files in the specified folder, in a stable order"""
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        for file in sorted(files):
             if file.endswith(".feature"):
-                file_path = os.path.join(root, file)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    feature_files.append(f.read())
-    return feature_files
\ No newline at end of file
+                yield os.path.join(root, file).replace("\\", "/")
+
+
+def iter_feature_files(folder_path) -> Iterator[Tuple[str, str]]:
+    """Lazily yield (path, content) for all .feature files in the specified folder"""
+    for file_path in iter_feature_paths(folder_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            yield file_path, f.read()
+
+
+@dataclass
+class ScenarioUnit:
+    """A single scenario plus the feature context needed to run it on its own"""
+    feature_path: str
+    feature_name: str
+    name: str
+    keyword: str
+    line: int
+    end_line: int
+    tags: List[str] = field(default_factory=list)
+    background: str = ""
+    rule: str = ""
+    rule_background: str = ""
+    text: str = ""
+
+    @property
+    def id(self) -> str:
+        return f"{self.feature_path}:{self.line}"
+
+    def render(self) -> str:
+        """Render the scenario as a standalone .feature document"""
+        parts = [f"Feature: {self.feature_name}"]
+        # The feature background comes before any Rule, the rule's own background inside it
+        if self.background:
+            parts.append(self.background)
+        if self.rule:
+            parts.append(f"  Rule: {self.rule}")
+            if self.rule_background:
+                parts.append(self.rule_background)
+        text = self.text
+        if self.tags:
+            # Feature and rule tags are inherited, so emitting all of them on the scenario keeps its tag set
+            indent = text[:len(text) - len(text.lstrip())]
+            text = f"{indent}{' '.join(self.tags)}\n{text}"
+        parts.append(text)
+        return "\n\n".join(parts) + "\n"
+
+
+def _tags_in(line: str) -> List[str]:
+    return re.findall(r"@[^\s@]+", line.split(" #", 1)[0])
+
+
+def parse_feature(file_path: str) -> Iterator[ScenarioUnit]:
+    """Stream the scenarios of a .feature file, yielding each one as soon as it ends"""
+    feature_name, feature_tags = "", []
+    rule_name, rule_tags = "", []
+    feature_background, rule_background = [], []
+    pending_tags: List[str] = []
+    pending_tag_lines: List[str] = []
+    section = None  # "background" or "scenario"
+    current = None
+    lines: List[str] = []
+    last_content_line = 0
+    fence = None
+
+    def finish():
+        current.text = "\n".join(lines).rstrip()
+        current.end_line = last_content_line
+        return current
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_no, raw in enumerate(f, start=1):
+            line = raw.rstrip("\n").rstrip("\r")
+            stripped = line.strip()
+
+            # Doc strings can contain anything, including keywords
+            if fence:
+                if stripped.startswith(fence):
+                    fence = None
+                if section == "scenario":
+                    lines.append(line)
+                    last_content_line = line_no
+                elif section == "background":
+                    (rule_background if rule_name else feature_background).append(line)
+                continue
+            if stripped.startswith('"""') or stripped.startswith("```"):
+                fence = stripped[:3]
+
+            if stripped.startswith("@"):
+                pending_tags.extend(_tags_in(stripped))
+                pending_tag_lines.append(line)
+                continue
+
+            keyword = next((k for k in SCENARIO_KEYWORDS if stripped.startswith(k)), None)
+            if stripped.startswith("Feature:"):
+                feature_name = stripped[len("Feature:"):].strip()
+                feature_tags, pending_tags = pending_tags, []
+                section = None
+                continue
+            if stripped and not stripped.startswith(EXAMPLES_KEYWORDS):
+                pending_tag_lines = []
+            if stripped.startswith("Rule:") or keyword or stripped.startswith("Background:"):
+                if current is not None:
+                    yield finish()
+                    current = None
+            if stripped.startswith("Rule:"):
+                rule_name = stripped[len("Rule:"):].strip()
+                rule_tags, pending_tags = pending_tags, []
+                rule_background = []
+                section = None
+                continue
+            if stripped.startswith("Background:"):
+                section = "background"
+                (rule_background if rule_name else feature_background).append(line)
+                continue
+            if keyword:
+                tags = feature_tags + rule_tags + pending_tags
+                pending_tags = []
+                current = ScenarioUnit(
+                    feature_path=file_path.replace("\\", "/"),
+                    feature_name=feature_name,
+                    name=stripped[len(keyword):].strip(),
+                    keyword=keyword.rstrip(":"),
+                    line=line_no,
+                    end_line=line_no,
+                    tags=list(dict.fromkeys(tags)),
+                    background="\n".join(feature_background).rstrip(),
+                    rule=rule_name,
+                    rule_background="\n".join(rule_background).rstrip(),
+                )
+                lines = [line]
+                last_content_line = line_no
+                section = "scenario"
+                continue
+
+            if section == "scenario":
+                if stripped.startswith("#"):
+                    continue
+                # Tags in front of an Examples block belong to the outline, not the next scenario
+                if stripped.startswith(EXAMPLES_KEYWORDS):
+                    lines.extend(pending_tag_lines)
+                    pending_tags = []
+                lines.append(line)
+                if stripped:
+                    last_content_line = line_no
+            elif section == "background" and not stripped.startswith("#"):
+                (rule_background if rule_name else feature_background).append(line)
+
+    if current is not None:
+        yield finish()
+
+
+def common_tags(file_path: str) -> List[str]:
+    """Tags shared by every scenario of a .feature file, feature level tags included"""
+    shared: Optional[List[str]] = None
+    for unit in parse_feature(file_path):
+        shared = unit.tags if shared is None else [tag for tag in shared if tag in unit.tags]
+    return shared or []
+
+
+def iter_scenarios(folder_path, tags: Optional[Iterable[str]] = None,
+                   exclude_tags: Optional[Iterable[str]] = None,
+                   shard_index: int = 0, shard_count: int = 1) -> Iterator[ScenarioUnit]:
+    """Lazily yield scenario-level work units from all .feature files in the folder.
+
+    Args:
+        folder_path: folder containing the .feature files
+        tags: only yield scenarios having at least one of these tags (e.g. ['@smoke'])
+        exclude_tags: skip scenarios having any of these tags
+        shard_index: index of this worker when splitting the scenarios between workers
+        shard_count: total number of workers; scenarios are assigned by a stable hash of their id
+    """
+    wanted = set(tags or [])
+    unwanted = set(exclude_tags or [])
+    for file_path in iter_feature_paths(folder_path):
+        for unit in parse_feature(file_path):
+            if wanted and not wanted.intersection(unit.tags):
+                continue
+            if unwanted.intersection(unit.tags):
+                continue
+            if shard_count > 1 and zlib.crc32(unit.id.encode("utf-8")) % shard_count != shard_index:
+                continue
+            yield unit
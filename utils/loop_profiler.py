@@ -0,0 +1,255 @@
+# Opt-in event loop profiler for the async agent stack.
+#
+# Enable with AGENT_PROFILE=1 (or `python main.py --loop-profile`). While a profiled run is
+# active we collect:
+#   - event loop lag: a task sleeps `interval` seconds in a loop and records how late it wakes up
+#   - blocking calls: a watchdog thread notices when that task has not run for longer than
+#     `threshold` and samples the loop thread's stack (sys._current_frames) until it runs again
+#   - per-coroutine time: a task factory wraps every new task's coroutine and measures the
+#     time spent in each step (send/throw), i.e. the time it held the loop
+# At the end of the run a collapsed stack file (profiles/<name>-<time>.folded, for
+# flamegraph.pl or speedscope) and a JSON summary are written.
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import collections.abc
+from typing import Any, Awaitable, Dict, List, Optional
+
+PROFILE_DIR = os.getenv("AGENT_PROFILE_DIR", "profiles")
+# A loop stall longer than this (seconds) is reported as a blocking call
+PROFILE_THRESHOLD = float(os.getenv("AGENT_PROFILE_THRESHOLD_MS", "100")) / 1000
+PROFILE_INTERVAL = float(os.getenv("AGENT_PROFILE_INTERVAL_MS", "20")) / 1000
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("AGENT_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+def _frame_name(frame) -> str:
+    filename = frame.f_code.co_filename
+    try:
+        filename = os.path.relpath(filename)
+    except ValueError:
+        pass
+    if filename.startswith(".."):
+        # Site packages and the standard library: keep the path from the package on
+        parts = filename.replace("\\", "/").split("/")
+        marker = next((i for i, part in enumerate(parts) if part in ("site-packages", "dist-packages")), None)
+        filename = "/".join(parts[marker + 1:] if marker is not None else parts[-2:])
+    return f"{frame.f_code.co_name} ({filename}:{frame.f_lineno})".replace(";", ":")
+
+
+def collapse_stack(frame) -> str:
+    """Collapsed stack of a frame, outermost frame first (without the profiler's own frames)"""
+    names = []
+    while frame is not None:
+        if frame.f_code.co_filename != __file__:
+            names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _coroutine_name(coro) -> str:
+    code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+    name = getattr(coro, "__qualname__", None) or type(coro).__name__
+    if code is not None:
+        return f"{name} ({os.path.basename(code.co_filename)})"
+    return name
+
+
+class TimedCoroutine(collections.abc.Coroutine):
+    """Wraps a task's coroutine and adds the time of each of its steps to the profiler"""
+
+    def __init__(self, coro, profiler: "LoopProfiler"):
+        self._coro = coro
+        self._profiler = profiler
+        self._name = _coroutine_name(coro)
+        profiler._coroutine(self._name)["tasks"] += 1
+
+    def _step(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._profiler._record_step(self._name, time.perf_counter() - started)
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    def __getattr__(self, name):
+        # cr_frame, cr_code... for asyncio's task repr and debugging
+        return getattr(self._coro, name)
+
+
+class LoopProfiler:
+    """Samples lag, blocking stacks and per-coroutine time of the running event loop"""
+
+    def __init__(self, name: str = "run", threshold: float = PROFILE_THRESHOLD,
+                 interval: float = PROFILE_INTERVAL, directory: str = PROFILE_DIR):
+        self.name = name
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self.lags: List[float] = []
+        self.stacks: Dict[str, int] = {}
+        self.blocking: List[Dict[str, Any]] = []
+        self.coroutines: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._previous_factory = None
+        self._started_at = 0.0
+
+    def _coroutine(self, name: str) -> Dict[str, float]:
+        return self.coroutines.setdefault(name, {"tasks": 0, "steps": 0, "total": 0.0, "max_step": 0.0})
+
+    def _record_step(self, name: str, duration: float):
+        stats = self._coroutine(name)
+        stats["steps"] += 1
+        stats["total"] += duration
+        stats["max_step"] = max(stats["max_step"], duration)
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if not isinstance(coro, TimedCoroutine):
+            coro = TimedCoroutine(coro, self)
+        if self._previous_factory is not None:
+            return self._previous_factory(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+    async def _sample_lag(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            self._heartbeat = expected
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - expected))
+
+    def _watch(self):
+        stall_started = None
+        event = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            stalled = time.perf_counter() - heartbeat
+            if stalled < self.threshold:
+                stall_started, event = None, None
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = collapse_stack(frame)
+            with self._lock:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                if stall_started != heartbeat:
+                    # A new stall: report it once with the stack it was first seen in
+                    stall_started = heartbeat
+                    event = {"at": round(heartbeat - self._started_at, 3), "duration": stalled, "stack": stack}
+                    self.blocking.append(event)
+                    print(f"[loop profiler] event loop blocked > {self.threshold * 1000:.0f} ms in: "
+                          f"{stack.rsplit(';', 1)[-1]}")
+                else:
+                    event["duration"] = stalled
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._heartbeat = self._started_at + self.interval
+        # Created before the task factory is installed so it is not part of the coroutine times
+        self._sampler = asyncio.create_task(self._sample_lag())
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-profiler-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> Dict[str, Any]:
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+        if self._sampler is not None:
+            # Count a stall at the very end of the run, before the sampler could wake up
+            late = time.perf_counter() - self._heartbeat
+            if late > 0:
+                self.lags.append(late)
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+        return self.write()
+
+    def summary(self) -> Dict[str, Any]:
+        lags = sorted(self.lags)
+
+        def percentile(p):
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))] * 1000, 2) if lags else None
+
+        coroutines = sorted(self.coroutines.items(), key=lambda item: -item[1]["total"])
+        return {
+            "name": self.name,
+            "duration_s": round(time.perf_counter() - self._started_at, 3),
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {
+                "samples": len(lags),
+                "mean": round(sum(lags) / len(lags) * 1000, 2) if lags else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(lags[-1] * 1000, 2) if lags else None,
+            },
+            "blocking_calls": sorted(
+                ({**event, "duration": round(event["duration"], 4)} for event in self.blocking),
+                key=lambda event: -event["duration"],
+            )[:50],
+            "coroutines": [
+                {"coroutine": name, "tasks": stats["tasks"], "steps": stats["steps"],
+                 "total_ms": round(stats["total"] * 1000, 2), "max_step_ms": round(stats["max_step"] * 1000, 2)}
+                for name, stats in coroutines[:100]
+            ],
+        }
+
+    def write(self) -> Dict[str, Any]:
+        """Write the .folded flamegraph input and the .json summary; returns the summary"""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        summary = self.summary()
+        with self._lock:
+            stacks = sorted(self.stacks.items(), key=lambda item: -item[1])
+        with open(f"{base}.folded", "w", encoding="utf-8") as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        lag = summary["lag_ms"]
+        print(f"[loop profiler] lag p50 {lag['p50']} ms, p99 {lag['p99']} ms, max {lag['max']} ms; "
+              f"{len(self.blocking)} blocking calls; written to {base}.json / {base}.folded")
+        return summary
+
+
+async def profiled(coro: Awaitable, name: str = "run"):
+    """Await the coroutine, profiling the event loop meanwhile if AGENT_PROFILE is set"""
+    if not profiling_enabled():
+        return await coro
+    profiler = LoopProfiler(name)
+    await profiler.start()
+    try:
+        return await coro
+    finally:
+        await profiler.stop()